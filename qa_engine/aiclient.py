@@ -1,6 +1,17 @@
+import os
 import json
+import random
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Protocol
 
+try:                                 # optional C parser; same ValueError on bad input
+    from orjson import loads as _loads
+except ImportError:
+    _loads = json.loads
+
 
 class AIClient(Protocol):
     def resolve(self, system_prompt: str, user_content: str, schema: dict) -> dict:
@@ -8,25 +19,318 @@ class AIClient(Protocol):
         ...
 
 
+# HTTP statuses worth retrying: timeouts, rate limits, server errors, overloaded.
+_RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+def _transient(exc) -> bool:
+    """True for errors a retry can cure (rate limit, overload, dropped connection).
+    Checked by status code / class name so the anthropic import stays lazy."""
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status in _RETRY_STATUS
+    return any(c.__name__ == "APIConnectionError" for c in type(exc).__mro__)
+
+
+class _RateLimiter:
+    """Spaces request starts at least 60/rpm seconds apart, shared by every thread
+    using the client, so parallel calls stay under a requests-per-minute quota
+    instead of bursting into 429s."""
+
+    def __init__(self, rpm: int, clock=time.monotonic, sleep=time.sleep):
+        self._interval = 60.0 / rpm
+        self._clock = clock
+        self._sleep = sleep
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self._lock:                    # reserve a slot, sleep outside the lock
+            now = self._clock()
+            start = max(now, self._next)
+            self._next = start + self._interval
+        if start > now:
+            self._sleep(start - now)
+
+
 class ClaudeAIClient:
-    """Standalone Claude Opus 4.8 adapter."""
+    """Standalone Claude Opus 4.8 adapter.
 
-    def __init__(self, anthropic_client=None, model: str = "claude-opus-4-8"):
+    Transient API errors (429/5xx/overloaded/connection) are retried with jittered
+    exponential backoff up to max_attempts; a reply that is not valid JSON is re-asked
+    once. Anything else (e.g. a 400) fails immediately so the caller's fallback runs.
+    With max_rpm set, calls (retries included) are paced to that many per minute.
+    One instance is safe to share across threads; the anthropic client pools its
+    HTTP connections. This wrapper owns the retries, so the SDK client it builds has
+    its own retries off (max_retries=0); pass one built the same way, or each of
+    these attempts also runs the SDK's retries and waits."""
+
+    def __init__(self, anthropic_client=None, model: str = "claude-opus-4-8",
+                 max_attempts: int = 5, sleep=time.sleep, max_rpm=None):
         if anthropic_client is None:
             import anthropic
-            anthropic_client = anthropic.Anthropic()   # reads ANTHROPIC_API_KEY
+            anthropic_client = anthropic.Anthropic(max_retries=0)   # reads ANTHROPIC_API_KEY
         self._c = anthropic_client
         self.model = model
+        self.max_attempts = max_attempts
+        self._sleep = sleep
+        self._limiter = _RateLimiter(max_rpm, sleep=sleep) if max_rpm else None
 
-    def resolve(self, system_prompt: str, user_content: str, schema: dict) -> dict:
-        resp = self._c.messages.create(
+    def _params(self, system_prompt: str, user_content: str, schema: dict) -> dict:
+        return dict(
             model=self.model,
-            max_tokens=2000,
+            # The reply echoes the (fixed) targets, so a batched prompt needs room
+            # proportional to its size; a reply cut off mid-JSON loses the whole call.
+            max_tokens=min(16000, 2000 + len(user_content) // 2),
             thinking={"type": "adaptive"},
             system=[{"type": "text", "text": system_prompt,
                      "cache_control": {"type": "ephemeral"}}],
             output_config={"format": {"type": "json_schema", "schema": schema}},
             messages=[{"role": "user", "content": user_content}],
         )
-        text = next(b.text for b in resp.content if b.type == "text")
-        return json.loads(text)
+
+    @staticmethod
+    def _parse(message) -> dict:
+        if getattr(message, "stop_reason", None) == "max_tokens":
+            # Truncated structured output can never parse; re-asking won't help.
+            raise RuntimeError("AI reply was cut off at max_tokens")
+        text = next(b.text for b in message.content if b.type == "text")
+        return _loads(text)
+
+    def resolve(self, system_prompt: str, user_content: str, schema: dict) -> dict:
+        params = self._params(system_prompt, user_content, schema)
+        bad_json = False
+        for attempt in range(1, self.max_attempts + 1):
+            if self._limiter is not None:
+                self._limiter.wait()
+            try:
+                return self._parse(self._c.messages.create(**params))
+            except ValueError:                      # json.JSONDecodeError
+                if bad_json or attempt == self.max_attempts:
+                    raise
+                bad_json = True                     # one re-ask, no backoff needed
+            except Exception as exc:
+                if not _transient(exc) or attempt == self.max_attempts:
+                    raise
+                self._sleep(min(60.0, 2.0 ** attempt) * random.uniform(0.5, 1.0))
+
+
+class ClaudeBatchAIClient(ClaudeAIClient):
+    """Claude adapter that sends resolve_many() through the Message Batches API:
+    half the per-token cost and no per-request rate limit, at the price of latency
+    (a batch can take minutes). For large unattended runs. Single resolve() calls
+    still go to the regular endpoint.
+
+    Polling gives up after max_wait seconds. With `state_path`, the id of each
+    submitted batch is stored under a key of its requests until its results are
+    read, so an interrupted or timed-out run that sends the same requests again
+    picks the batch up instead of paying for it twice."""
+
+    def __init__(self, anthropic_client=None, model: str = "claude-opus-4-8",
+                 poll_interval: float = 30.0, sleep=time.sleep, max_rpm=None,
+                 max_wait: float = 3600.0, state_path=None, clock=time.monotonic):
+        super().__init__(anthropic_client, model, sleep=sleep, max_rpm=max_rpm)
+        self.poll_interval = poll_interval
+        self.max_wait = max_wait
+        self.state_path = state_path
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def _load_state(self) -> dict:
+        if not self.state_path or not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, encoding="utf-8") as fh:
+                state = _loads(fh.read())
+        except ValueError:
+            return {}
+        return state if isinstance(state, dict) else {}
+
+    def _set_state(self, key, batch_id) -> None:
+        """Record (or, with batch_id None, drop) the in-flight batch for key."""
+        if not self.state_path:
+            return
+        with self._lock:
+            state = self._load_state()
+            if batch_id is None:
+                state.pop(key, None)
+            else:
+                state[key] = batch_id
+            tmp = self.state_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as fh:
+                json.dump(state, fh)
+            os.replace(tmp, self.state_path)
+
+    def _submit(self, batches, key, params):
+        """The in-flight batch recorded for these requests, else a new one."""
+        batch_id = self._load_state().get(key)
+        if batch_id:
+            try:
+                return batches.retrieve(batch_id)
+            except Exception:
+                pass                          # gone or unknown -> submit anew
+        batch = batches.create(requests=[
+            {"custom_id": f"r{i}", "params": p} for i, p in enumerate(params)])
+        self._set_state(key, batch.id)
+        return batch
+
+    def resolve_many(self, requests, max_workers=1) -> list:
+        """Submit every request as one message batch (or resume the one already in
+        flight for them), poll until it ends, and return results in input order (an
+        errored/expired request yields an exception). Raises TimeoutError when the
+        batch is still processing after max_wait seconds; it stays recorded."""
+        if not requests:
+            return []
+        batches = self._c.messages.batches
+        params = [self._params(*req) for req in requests]
+        key = hashlib.blake2b(json.dumps(params, ensure_ascii=False, sort_keys=True)
+                              .encode("utf-8"), digest_size=20).hexdigest()
+        batch = self._submit(batches, key, params)
+        deadline = self._clock() + self.max_wait
+        while batch.processing_status != "ended":
+            if self._clock() >= deadline:
+                raise TimeoutError(f"message batch {batch.id} still processing after "
+                                   f"{self.max_wait:.0f}s; a rerun picks it up")
+            self._sleep(self.poll_interval)
+            batch = batches.retrieve(batch.id)
+
+        out = [RuntimeError("request missing from batch results")] * len(requests)
+        for entry in batches.results(batch.id):
+            i = int(entry.custom_id[1:])
+            if entry.result.type != "succeeded":
+                out[i] = RuntimeError(f"batch request {entry.result.type}")
+                continue
+            try:
+                out[i] = self._parse(entry.result.message)
+            except Exception as exc:
+                out[i] = exc
+        self._set_state(key, None)
+        return out
+
+
+class AnswerCache:
+    """Thread-safe key -> answer store behind CachingAIClient. Entries live in
+    memory and, when `path` is given, are appended to a JSONL file (one {"k", "v"}
+    per line) so later runs reuse them. Append-only keeps each miss O(1) to
+    persist; a torn last line from an interrupted write is skipped on load.
+
+    At most `max_entries` answers are kept: past that the oldest are dropped and
+    the file is rewritten with the rest, so neither memory nor the file grows
+    without bound. Share one instance between clients that write the same file."""
+
+    def __init__(self, path=None, max_entries=20000):
+        self.path = path
+        self.max_entries = max_entries
+        self._data = {}
+        self._lock = threading.Lock()
+        self._torn = False     # file lacks a final newline -> start next append fresh
+        if path and os.path.exists(path):
+            lines = 0
+            with open(path, encoding="utf-8") as fh:
+                for line in fh:
+                    lines += 1
+                    self._torn = not line.endswith("\n")
+                    try:
+                        rec = _loads(line)
+                        self._data.pop(rec["k"], None)       # re-insert as newest
+                        self._data[rec["k"]] = rec["v"]
+                    except (ValueError, KeyError, TypeError):
+                        continue   # torn/corrupt line -> just a cache miss
+            if len(self._data) > max_entries or lines > 2 * max_entries:
+                self._compact()
+
+    def get(self, key):
+        with self._lock:
+            return self._data.get(key)
+
+    def put(self, key, data) -> None:
+        with self._lock:
+            self._data[key] = data
+            if len(self._data) > self.max_entries:
+                self._compact()
+            elif self.path:
+                with open(self.path, "a", encoding="utf-8") as fh:
+                    if self._torn:
+                        fh.write("\n")
+                        self._torn = False
+                    fh.write(json.dumps({"k": key, "v": data}, ensure_ascii=False) + "\n")
+
+    def _compact(self) -> None:
+        """Keep the newest half of max_entries and rewrite the file to match."""
+        keep = list(self._data.items())[-(self.max_entries // 2 or 1):]
+        self._data = dict(keep)
+        if self.path:
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as fh:
+                for k, v in keep:
+                    fh.write(json.dumps({"k": k, "v": v}, ensure_ascii=False) + "\n")
+            os.replace(tmp, self.path)
+            self._torn = False
+
+
+class CachingAIClient:
+    """Exact-match memo around any AIClient: identical (system, user, schema, model)
+    requests are answered from cache instead of re-calling the model — repeated
+    segments are common in mqxliff files, and a rerun of the same file is then free.
+
+    Answers are kept in an AnswerCache: a private one on `path`, or a shared
+    `cache` passed in. Failed calls are never cached."""
+
+    def __init__(self, inner, path=None, cache=None):
+        self._inner = inner
+        self.model = getattr(inner, "model", "")
+        self._cache = cache if cache is not None else AnswerCache(path)
+
+    def _key(self, system_prompt, user_content, schema) -> str:
+        raw = json.dumps([system_prompt, user_content, schema, self.model],
+                         ensure_ascii=False, sort_keys=True)
+        return hashlib.blake2b(raw.encode("utf-8"), digest_size=20).hexdigest()
+
+    def resolve(self, system_prompt: str, user_content: str, schema: dict) -> dict:
+        key = self._key(system_prompt, user_content, schema)
+        data = self._cache.get(key)
+        if data is not None:
+            return data
+        data = self._inner.resolve(system_prompt, user_content, schema)
+        self._cache.put(key, data)
+        return data
+
+    def resolve_many(self, requests, max_workers=1) -> list:
+        """Serve cached requests directly; send only the misses on to the inner
+        client (through its own resolve_many when it has one, e.g. a batch API)."""
+        keys = [self._key(*req) for req in requests]
+        out = [self._cache.get(key) for key in keys]
+        miss = [i for i, data in enumerate(out) if data is None]
+        fresh = resolve_many(self._inner, [requests[i] for i in miss], max_workers)
+        for i, data in zip(miss, fresh):
+            out[i] = data
+            if not isinstance(data, Exception):
+                self._cache.put(keys[i], data)
+        return out
+
+
+def resolve_many(ai_client, requests, max_workers=1) -> list:
+    """Run several independent structured completions. requests: list of
+    (system_prompt, user_content, schema). Returns results in input order; a call
+    that raises yields its exception in that slot instead of propagating, so each
+    caller keeps its own per-request fallback. With max_workers>1 the calls overlap
+    on a thread pool (they are network-bound), bounded to max_workers in flight.
+    A client with its own resolve_many (e.g. ClaudeBatchAIClient) is delegated to."""
+    if not requests:
+        return []
+    if hasattr(ai_client, "resolve_many"):
+        try:
+            return ai_client.resolve_many(requests, max_workers)
+        except Exception as exc:
+            return [exc] * len(requests)
+
+    def _one(req):
+        try:
+            return ai_client.resolve(*req)
+        except Exception as exc:
+            return exc
+
+    if max_workers <= 1 or len(requests) <= 1:
+        return [_one(r) for r in requests]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(requests))) as pool:
+        return list(pool.map(_one, requests))
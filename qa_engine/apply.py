@@ -1,58 +1,111 @@
+import codecs
+import os
 import re
 import shutil
 from lxml import etree
 from xml.sax.saxutils import escape as _xml_escape
 from .tags import detokenize
+from .parser import _PARSER
+from .resolvers.base import normalize_code as _norm
 
 _XLIFF = "urn:oasis:names:tc:xliff:document:1.2"
 _MQ = "MQXliff"
 
 _TU_RE = re.compile(r"<trans-unit\b.*?</trans-unit>", re.DOTALL)
 _TARGET_RE = re.compile(r"(<target\b[^>]*>)(.*?)(</target>)", re.DOTALL)
+# Per-block patterns, compiled once: these run for every trans-unit in the file.
+_EW_RE = re.compile(r"<mq:errorwarning\b[^>]*/>")
+_EW_CODE_RE = re.compile(r'mq:errorwarning-code="([^"]+)"')
+_INCONSISTENCY_EW_RE = re.compile(
+    r'\s*<mq:errorwarning\b[^>]*mq:errorwarning-problemname="inconsistent translation"[^>]*/>')
+_SEGGUID_ATTR = 'mq:segmentguid="'
+# appended in place of an errorwarning's "/>" to mark it ignored
+_IGNORED_CLOSE = ' mq:errorwarning-ignored="errorwarning-ignored" />'
 
 
 def _segguid(block: str):
-    m = re.search(r'mq:segmentguid="([^"]+)"', block)
-    return m.group(1) if m else None
+    # fixed attribute prefix: two str.find calls instead of a regex search
+    i = block.find(_SEGGUID_ATTR)
+    if i < 0:
+        return None
+    i += len(_SEGGUID_ATTR)
+    j = block.find('"', i)
+    return block[i:j] if j > i else None
 
 
 def _set_target(block: str, new_inner: str) -> str:
-    return _TARGET_RE.sub(lambda m: m.group(1) + new_inner + m.group(3), block, count=1)
-
-
-def _norm(code: str) -> str:
-    try:
-        return str(int(code))
-    except (TypeError, ValueError):
-        return code or ""
+    """Replace the first <target>'s whole inner content in one splice."""
+    m = _TARGET_RE.search(block)
+    if m is None:
+        return block
+    return block[:m.start(2)] + new_inner + block[m.end(2):]
 
 
 def _mark_ignored(block: str, codes=None) -> str:
     """Add the ignored attribute to errorwarnings on the segment. When `codes` is
-    None, mark every errorwarning; otherwise only those whose code is in `codes`
-    (normalized, e.g. '2016' matches '02016')."""
-    want = None if codes is None else {_norm(c) for c in codes}
+    None, mark every errorwarning; otherwise only those whose code is in `codes`,
+    a set of already-normalized codes (e.g. '2016' matches '02016')."""
+    if "<mq:errorwarning" not in block:          # plain substring test before any regex
+        return block
 
     def repl(m):
         ew = m.group(0)
         if "errorwarning-ignored=" in ew:
             return ew
-        if want is not None:
-            cm = re.search(r'mq:errorwarning-code="([^"]+)"', ew)
-            if cm is None or _norm(cm.group(1)) not in want:
+        if codes is not None:
+            cm = _EW_CODE_RE.search(ew)
+            if cm is None or _norm(cm.group(1)) not in codes:
                 return ew
-        return ew[:-2].rstrip() + ' mq:errorwarning-ignored="errorwarning-ignored" />'
-    return re.sub(r"<mq:errorwarning\b[^>]*/>", repl, block)
+        return ew[:-2].rstrip() + _IGNORED_CLOSE
+    return _EW_RE.sub(repl, block)
 
 
 def _remove_inconsistency_warnings(block: str) -> str:
-    return re.sub(
-        r'\s*<mq:errorwarning\b[^>]*mq:errorwarning-problemname="inconsistent translation"[^>]*/>',
-        "", block)
+    if "inconsistent translation" not in block:  # most rewritten blocks have none
+        return block
+    return _INCONSISTENCY_EW_RE.sub("", block)
+
+
+def _edited_pieces(text: str, edit_block):
+    """Yield `text` with every trans-unit passed through `edit_block`, piece by
+    piece, instead of materializing the whole substituted string."""
+    pos = 0
+    for m in _TU_RE.finditer(text):
+        yield text[pos:m.start()]
+        yield edit_block(m)
+        pos = m.end()
+    yield text[pos:]
+
+
+def _chunks(pieces, size: int = 1 << 20):
+    """Group small pieces into ~`size`-character strings for fewer writes/feeds."""
+    buf, n = [], 0
+    for p in pieces:
+        buf.append(p)
+        n += len(p)
+        if n >= size:
+            yield "".join(buf)
+            buf, n = [], 0
+    if buf:
+        yield "".join(buf)
+
+
+def _backup(path: str) -> None:
+    """Keep the original as <path>.bak. A hard link costs no copy at all; the
+    output is always written to a new file and renamed into place, so the linked
+    original is never modified. Falls back to a kernel-side copy when linking is
+    not possible (other filesystem, no permission)."""
+    bak = path + ".bak"
+    if os.path.lexists(bak):
+        os.remove(bak)
+    try:
+        os.link(path, bak)
+    except OSError:
+        shutil.copyfile(path, bak)
 
 
 def apply_decisions(in_path: str, decisions: dict, cases: list, out_path: str, ws_fixes=None):
-    shutil.copy(in_path, in_path + ".bak")
+    _backup(in_path)
 
     with open(in_path, encoding="utf-8-sig", newline="") as fh:
         text = fh.read()
@@ -109,12 +162,24 @@ def apply_decisions(in_path: str, decisions: dict, cases: list, out_path: str, w
             block = _mark_ignored(block)
         return block
 
-    new_text = _TU_RE.sub(edit_block, text)
-
-    etree.fromstring(new_text.encode("utf-8"))
-
-    with open(out_path, "w", encoding="utf-8-sig", newline="") as fh:
-        fh.write(new_text)
+    # Stream the edited document out in chunks, feeding the same bytes to an
+    # incremental parser: no second full-size copy of the output is built, and
+    # a malformed result still never replaces out_path.
+    feed = etree.XMLParser(huge_tree=True, resolve_entities=False)
+    tmp = out_path + ".tmp"
+    try:
+        with open(tmp, "wb") as fh:
+            fh.write(codecs.BOM_UTF8)
+            for chunk in _chunks(_edited_pieces(text, edit_block)):
+                data = chunk.encode("utf-8")
+                feed.feed(data)
+                fh.write(data)
+            feed.close()    # raises XMLSyntaxError on a malformed result
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    os.replace(tmp, out_path)   # new inode: a hard-linked .bak of out_path stays intact
 
     return skipped
 
@@ -164,9 +229,9 @@ def apply_resolved_items(content: bytes, items) -> bytes:
         if ign is None:
             block = _mark_ignored(block)            # all codes
         elif ign:
-            block = _mark_ignored(block, ign)        # specific codes
+            block = _mark_ignored(block, ign)        # specific codes, normalized above
         return block
 
-    new_text = _TU_RE.sub(edit_block, text)
-    etree.fromstring(new_text.encode("utf-8"))     # validate before returning
-    return new_text.encode("utf-8-sig")
+    data = _TU_RE.sub(edit_block, text).encode("utf-8-sig")   # BOM + body, no copy
+    etree.fromstring(data, _PARSER)                 # validate before returning
+    return data
@@ -17,6 +17,12 @@ def build_cases(members: list) -> list:
     by_source = {}
     for m in warned:
         by_source.setdefault(m.source_text, []).append(m)
+    # every member (warned or not) by source / target, built in one pass so each
+    # group's "same source"/"same target" lookup is a dict hit, not a full scan
+    all_by_source, all_by_target = {}, {}
+    for m in members:
+        all_by_source.setdefault(m.source_text, []).append(m)
+        all_by_target.setdefault(m.target_text, []).append(m)
 
     cases = []
     seen_ids = set()
@@ -24,9 +30,8 @@ def build_cases(members: list) -> list:
 
     # source-inconsistency first: a source mapping to >1 distinct target
     for src, group in by_source.items():
-        targets = {m.target_text for m in group}
         # pull in non-warned members that share this source (the "other" variant)
-        same_source = [m for m in members if m.source_text == src]
+        same_source = all_by_source[src]
         all_targets = {m.target_text for m in same_source}
         if len(all_targets) > 1:
             cid += 1
@@ -41,7 +46,7 @@ def build_cases(members: list) -> list:
     for tgt, group in by_target.items():
         if any(m.tu_id in seen_ids for m in group):
             continue
-        same_target = [m for m in members if m.target_text == tgt]
+        same_target = all_by_target[tgt]
         all_sources = {m.source_text for m in same_target}
         if len(all_sources) > 1:
             cid += 1
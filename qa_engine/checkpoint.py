@@ -1,15 +1,24 @@
 """Resumable checkpoint for analysis: persists each segment's ResolvedItem to a JSON
-file keyed by segmentguid, so a long run that is interrupted (e.g. a Streamlit rerun
+Lines file keyed by segmentguid, so a long run that is interrupted (e.g. a Streamlit rerun
 on a big file) resumes from where it left off instead of restarting from zero.
 
 Keyed per input file via content_key() so different files use different caches.
-Writes are atomic (write-tmp + os.replace) so an interrupted flush never corrupts it."""
+The file is an append-only journal (one item per line, hence a `.jsonl` name), so a
+flush writes only the new results; a torn last line from an interrupted append is
+skipped on load. A checkpoint left under the older `<key>.json` name is moved into
+the `.jsonl` file the first time it is opened."""
 import os
 import json
+import time
 import hashlib
 from dataclasses import asdict
 from .models import ResolvedItem, Resolution
 
+try:                                 # optional C parser; same ValueError on bad input
+    from orjson import loads as _loads
+except ImportError:
+    _loads = json.loads
+
 
 def content_key(content: bytes) -> str:
     """Stable short key for a file's bytes — use in the checkpoint filename."""
@@ -24,17 +33,42 @@ def _item_from_dict(d: dict) -> ResolvedItem:
 
 class Checkpoint:
     """Per-segment result cache. `has`/`get_item` to resume; `save_item` then `flush`
-    to persist (batch many saves, flush once per batch)."""
+    to persist (batch many saves, flush once per batch). A flush appends only the
+    items saved since the previous one, so its cost follows the new work rather than
+    the size of the run; `maybe_flush` is the cheap per-batch call and writes at most
+    once per `min_interval` seconds; a final `flush` persists whatever is left."""
 
-    def __init__(self, path=None):
+    def __init__(self, path=None, min_interval=5.0):
         self.path = path
+        self.min_interval = min_interval
+        self._last_flush = time.monotonic()
         self._data = {}      # segmentguid -> ResolvedItem-as-dict
+        self._pending = {}   # the subset saved since the last flush
+        self._torn = False   # file lacks a final newline -> start next append fresh
+        legacy = path[:-1] if path and path.endswith(".jsonl") else None
         if path and os.path.exists(path):
-            try:
-                with open(path, encoding="utf-8") as fh:
-                    self._data = json.load(fh)
-            except Exception:
-                self._data = {}   # corrupt/partial cache -> start fresh
+            self._load(path)
+        elif legacy and os.path.exists(legacy):
+            self._load(legacy)
+            self._torn = False
+            self._pending = dict(self._data)
+            self.flush()                 # rewrite as .jsonl, then drop the old name
+            os.remove(legacy)
+
+    def _load(self, path) -> None:
+        with open(path, encoding="utf-8") as fh:
+            for line in fh:
+                self._torn = not line.endswith("\n")
+                try:
+                    rec = _loads(line)
+                except ValueError:
+                    continue          # torn/corrupt line -> that segment reruns
+                if not isinstance(rec, dict):
+                    continue
+                if "segmentguid" in rec:
+                    self._data[rec["segmentguid"]] = rec   # later lines win
+                else:
+                    self._data.update(rec)   # whole-file snapshot (older format)
 
     def has(self, guid) -> bool:
         return guid in self._data
@@ -47,17 +81,32 @@ class Checkpoint:
         return [_item_from_dict(d) for d in self._data.values()]
 
     def save_item(self, item) -> None:
-        self._data[item.segmentguid] = asdict(item)
+        d = asdict(item)
+        if self._data.get(item.segmentguid) == d:
+            return                # resumed unchanged from the file: nothing to append
+        self._data[item.segmentguid] = d
+        self._pending[item.segmentguid] = d
+
+    def maybe_flush(self) -> None:
+        if time.monotonic() - self._last_flush >= self.min_interval:
+            self.flush()
 
     def flush(self) -> None:
-        if not self.path:
+        if not self.path or not self._pending:
             return
-        tmp = self.path + ".tmp"
-        with open(tmp, "w", encoding="utf-8") as fh:
-            json.dump(self._data, fh, ensure_ascii=False)
-        os.replace(tmp, self.path)   # atomic: never leaves a half-written cache
+        lines = "".join(json.dumps(d, ensure_ascii=False) + "\n"
+                        for d in self._pending.values())
+        with open(self.path, "a", encoding="utf-8") as fh:
+            if self._torn:
+                fh.write("\n")
+                self._torn = False
+            fh.write(lines)
+        self._pending = {}
+        self._last_flush = time.monotonic()
 
     def clear(self) -> None:
         self._data = {}
+        self._pending = {}
+        self._torn = False
         if self.path and os.path.exists(self.path):
             os.remove(self.path)
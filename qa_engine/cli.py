@@ -2,6 +2,7 @@ import argparse
 import json
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import asdict
 
 from .parser import parse_mqxliff
@@ -13,15 +14,18 @@ from .report import write_reports
 from .apply import apply_decisions
 from .models import Decision
 from .whitespace import compute_ws_fixes, normalize_members
+from .aiclient import ClaudeAIClient, CachingAIClient
 
 
-def _make_client():
-    import anthropic
-    return anthropic.Anthropic()  # reads ANTHROPIC_API_KEY
+def _make_client(model):
+    return ClaudeAIClient(model=model)  # reads ANTHROPIC_API_KEY
 
 
-def run_analyze(in_path, out_dir, glossary_path, model, client=None, limit=None):
-    client = client or _make_client()
+def run_analyze(in_path, out_dir, glossary_path, model, client=None, limit=None, workers=1,
+                cache_path=None):
+    client = client or _make_client(model)
+    if cache_path:                              # reruns answer unchanged cases from disk
+        client = CachingAIClient(client, path=cache_path)
     members = parse_mqxliff(in_path)
     ws_fixes = compute_ws_fixes(members)        # detect BEFORE normalizing
     normalize_members(members)                  # collapse pure edge-ws inconsistencies
@@ -32,14 +36,17 @@ def run_analyze(in_path, out_dir, glossary_path, model, client=None, limit=None)
     gloss_text = "\n".join(f"{k} = {v}" for k, v in glossary.items())
     system_prompt = build_system_prompt(gloss_text)
 
-    decisions = {}
-    for case in cases:
+    def classify(case):
         payload = build_case_payload(case, members, glossary)
         try:
-            decisions[case.id] = classify_case(client, payload, system_prompt, model)
+            return classify_case(client, payload, system_prompt, model)
         except Exception as exc:  # isolate per-case failures
-            decisions[case.id] = Decision(case.id, "needs_manual",
-                                          f"AI/processing error: {exc}", "low")
+            return Decision(case.id, "needs_manual", f"AI/processing error: {exc}", "low")
+
+    # Cases are independent and each is one network round trip: keep up to
+    # `workers` in flight. map() preserves case order.
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        decisions = {c.id: d for c, d in zip(cases, pool.map(classify, cases))}
     write_reports(cases, decisions, out_dir, ws_fixes=ws_fixes)
     print(f"Analyzed {len(cases)} cases, {len(ws_fixes)} whitespace fixes "
           f"-> {out_dir}/report.html, {out_dir}/decisions.json")
@@ -72,8 +79,10 @@ def run_apply(in_path, decisions_path, out_path, include_low, force):
     skipped = apply_decisions(in_path, decisions, cases, out_path, ws_fixes=ws_fixes)
     print(f"Applied {len(decisions)} decisions, {len(ws_fixes)} whitespace fixes -> {out_path}"
           + (f" ({skipped_low} low-confidence skipped)" if skipped_low else ""))
-    for case_id, tu_id, reason in skipped:
-        print(f"  WARNING: case {case_id} segment {tu_id} left unchanged (tag mismatch): {reason}")
+    if skipped:                                 # one write for the whole block
+        sys.stdout.write("".join(
+            f"  WARNING: case {case_id} segment {tu_id} left unchanged (tag mismatch): {reason}\n"
+            for case_id, tu_id, reason in skipped))
 
 
 def main(argv=None):
@@ -86,6 +95,10 @@ def main(argv=None):
     a.add_argument("--glossary", default=None)
     a.add_argument("--model", default="claude-opus-4-8")
     a.add_argument("--limit", type=int, default=None)
+    a.add_argument("--workers", type=int, default=4,
+                   help="AI calls kept in flight at once")
+    a.add_argument("--cache", default=None,
+                   help="JSONL file of AI replies reused across runs")
 
     ap = sub.add_parser("apply")
     ap.add_argument("input")
@@ -96,7 +109,8 @@ def main(argv=None):
 
     args = p.parse_args(argv)
     if args.cmd == "analyze":
-        run_analyze(args.input, args.out_dir, args.glossary, args.model, limit=args.limit)
+        run_analyze(args.input, args.out_dir, args.glossary, args.model, limit=args.limit,
+                    workers=args.workers, cache_path=args.cache)
     else:
         out = args.out or args.input.replace(".mqxliff", ".FIXED.mqxliff")
         run_apply(args.input, args.decisions, out, args.include_low, args.force)
@@ -10,13 +10,11 @@ def build_case_payload(case, all_members, glossary):
     source_variants = [{"key": s, "text": s, "count": c} for s, c in src_counts.items()]
     target_variants = [{"text": t, "count": c} for t, c in tgt_counts.items()]
 
-    # glossary suggestion keyed on the (first) source text
+    # glossary suggestion keyed on the (first) source text; each distinct source is
+    # looked up once (in first-seen order), and not at all without a glossary
     gloss = None
-    for m in case.members:
-        hit = lookup(glossary, m.source_text)
-        if hit:
-            gloss = hit
-            break
+    if glossary:
+        gloss = next((hit for hit in (lookup(glossary, s) for s in src_counts) if hit), None)
 
     # one TM suggestion if any member carries one
     tm = next((m.tm_match for m in case.members if m.tm_match), None)
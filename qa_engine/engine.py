@@ -1,4 +1,5 @@
 from dataclasses import replace
+from xml.sax.saxutils import escape as _xml_escape
 from .models import ReviewSession, ResolvedItem, Resolution, Progress
 from .parser import parse_issues, parse_languages
 from .registry import STRATEGY_BY_CODE, register_resolver, get_resolver
@@ -6,13 +7,16 @@ from .resolvers.base import normalize_code, ReportOnlyResolver
 from .resolvers.whitespace_resolver import WhitespaceResolver
 from .resolvers.inconsistency_resolver import resolve_inconsistencies
 from .resolvers.inconsistency_xseg import resolve_inconsistency_groups
-from .resolvers.ai_segment_resolver import resolve_segment
-from .resolvers.batch_resolver import resolve_segment_batch
+from .resolvers.ai_segment_resolver import resolve_segment, resolve_segments
+from .resolvers.batch_resolver import resolve_segment_batches, pack_batches, AI_FALLBACK
 from .qa_codes import BULK_SUITABLE_CODES, RISKY_CODES, describe_code
 from .tagfix import plan_tag_structure, TAG_STRUCTURE_CODES
 from .apply import apply_resolved_items
 from .tags import detokenize
 
+# Codes handled without the AI (whitespace + tag structure); anything else is content.
+_NON_CONTENT_CODES = BULK_SUITABLE_CODES | TAG_STRUCTURE_CODES
+
 # Register deterministic resolvers for their codes (one shared instance).
 _WS = WhitespaceResolver()
 for _code, _strat in STRATEGY_BY_CODE.items():
@@ -30,37 +34,55 @@ def _disp(text, tags):
         return text
 
 
-def _needs_ai_segment(guid, seg_codes, xseg, ignore_all=()) -> bool:
+def _needs_ai_segment(guid, seg_codes, xseg, ignore_all=frozenset()) -> bool:
     """True if this segment requires an AI call (content codes, or whitespace on a
     reordered segment) and isn't already decided by Phase A. Codes the user bulk-
     ignored don't count."""
     if guid in xseg:
         return False
-    active = [c for c in seg_codes if c not in ignore_all]
-    ws = [c for c in active if c in BULK_SUITABLE_CODES]
-    content = [c for c in active
-               if c not in BULK_SUITABLE_CODES and c not in TAG_STRUCTURE_CODES]
-    return bool(content or (ws and "2016" in active))
+    reordered = ws = False
+    for c in seg_codes:                   # one pass; stops at the first content code
+        if c in ignore_all:
+            continue
+        if c not in _NON_CONTENT_CODES:
+            return True
+        reordered = reordered or c == "2016"
+        ws = ws or c in BULK_SUITABLE_CODES
+    return reordered and ws
+
+
+def _ai_key(member, seg_issues):
+    """Identity of a segment's AI question: two segments with the same source,
+    target, tag XML and flagged codes get the same answer, so only one is asked."""
+    return (member.source_text, member.target_text,
+            tuple(sorted(member.target_tags.items())),
+            tuple((normalize_code(i.code), i.problemname, i.args) for i in seg_issues))
 
 
 def _plan_segment(guid, member, seg_issues, ai_client, xseg, threshold,
-                  ai_result=None, ignore_all=()) -> Resolution:
+                  ai_result=None, ignore_all=frozenset(), seg_codes=None) -> Resolution:
     """Single combined resolution for one segment, covering ALL its codes:
     deterministic whitespace + deterministic tag-structure (2016 false-positive,
     2011 count-parity) + LLM for content codes; per-code false positives recorded
     in ignore_codes. Codes in `ignore_all` are bulk-marked false-positive (translation
-    untouched) and skip all processing. Auto-applies only when nothing needs human judgement."""
-    all_codes = [normalize_code(i.code) for i in seg_issues]
-    forced_ignore = [c for c in all_codes if c in ignore_all]
-    codes = [c for c in all_codes if c not in ignore_all]   # codes still to process
-    ws_codes = [c for c in codes if c in BULK_SUITABLE_CODES]
-    tag_codes = [c for c in codes if c in TAG_STRUCTURE_CODES]
-    content_codes = [c for c in codes
-                     if c not in BULK_SUITABLE_CODES and c not in TAG_STRUCTURE_CODES]
+    untouched) and skip all processing. Auto-applies only when nothing needs human judgement.
+    `seg_codes` (the issues' normalized codes) may be passed when already computed."""
+    all_codes = seg_codes if seg_codes is not None else [normalize_code(i.code) for i in seg_issues]
+    # one pass sorts the codes into their buckets instead of a filtered list each
+    forced_ignore, ws_codes, tag_codes, content_codes = [], [], [], []
+    for c in all_codes:
+        if c in ignore_all:
+            forced_ignore.append(c)
+        elif c in BULK_SUITABLE_CODES:
+            ws_codes.append(c)
+        elif c in TAG_STRUCTURE_CODES:
+            tag_codes.append(c)
+        else:
+            content_codes.append(c)
     # 2016 means the target reordered the tags — positional whitespace alignment is
     # then unreliable, so any whitespace on a reordered segment goes to the AI
     # (which sees source+target and is tag-guarded) rather than the deterministic aligner.
-    reordered = "2016" in codes
+    reordered = "2016" in tag_codes
 
     tag_ignore, tag_target, remaining_tag = ([], None, [])
     if tag_codes:
@@ -128,6 +150,11 @@ def reconcile(session) -> None:
             f"ledger mismatch: accounted {accounted} != detected {session.total_issues}")
 
 
+def _ai_failed(res) -> bool:
+    """A stand-in for a failed AI call rather than an answer."""
+    return res.action == "report" or res.strategy == AI_FALLBACK
+
+
 def _verdict_label(res) -> str:
     if res.needs_approval:
         return "needs_approval"
@@ -151,22 +178,33 @@ def _make_item(guid, member, seg_issues, res) -> ResolvedItem:
 
 
 def analyze_stream(content: bytes, ai_client=None, glossary=None, threshold=100,
-                   batch_size=1, checkpoint=None, ignore_all_codes=None):
+                   batch_size=1, checkpoint=None, ignore_all_codes=None, concurrency=1,
+                   flush_batches=None):
     """Generator: resolve each flagged segment, yielding a Progress as each finalizes.
     Returns the finished ReviewSession (PEP 380 — via StopIteration.value, or use analyze()).
 
-    batch_size>1 sends content/AI segments to the LLM in groups of that size (far fewer
-    calls on big files). A `checkpoint` (qa_engine.checkpoint.Checkpoint) caches each
-    segment's result and is flushed after every batch, so an interrupted run resumes
-    instead of restarting — and partial work is never lost."""
+    batch_size>1 sends content/AI segments to the LLM in groups of up to that size (far
+    fewer calls on big files; long segments are packed into smaller groups). concurrency>1
+    keeps up to that many AI calls (batched or single-segment) in flight at once
+    (network-bound, so wall time drops roughly by that factor). AI segments are queued
+    until `flush_batches` batches are ready (default: concurrency, one round of calls);
+    a message-batch client can take far more per submission. A `checkpoint`
+    (qa_engine.checkpoint.Checkpoint) caches each segment's result and is flushed every
+    few seconds between batches and once more at the end — also when the generator is
+    closed early — so an interrupted run resumes instead of restarting and partial work
+    is never lost."""
     src_lang, tgt_lang = parse_languages(content)
-    issues, members = parse_issues(content)
+    # Phase A and the per-segment pass only look up segments that carry a warning.
+    issues, members = parse_issues(content, flagged_only=True)
     total_issues = len(issues)
-    ignore_all = {normalize_code(c) for c in (ignore_all_codes or ())}
+    ignore_all = frozenset(normalize_code(c) for c in (ignore_all_codes or ()))
 
     by_seg = {}
     for it in issues:
         by_seg.setdefault(it.segmentguid, []).append(it)
+    # normalized codes per segment, computed once: routing, planning and progress
+    # events all read them
+    codes_by_seg = {g: [normalize_code(i.code) for i in its] for g, its in by_seg.items()}
     ordered_guids = sorted(by_seg, key=lambda g: int(by_seg[g][0].tu_id)
                            if by_seg[g][0].tu_id.isdigit() else 0)
     total_segs = len(ordered_guids)
@@ -174,71 +212,114 @@ def analyze_stream(content: bytes, ai_client=None, glossary=None, threshold=100,
     # Phase A: cross-segment inconsistency (3100/3101) decided before the per-segment pass.
     xseg = {}
     if ai_client is not None:
-        xseg = resolve_inconsistency_groups(issues, members, ai_client)
+        resumed = (frozenset(g for g in by_seg if checkpoint.has(g))
+                   if checkpoint is not None else frozenset())
+        xseg = resolve_inconsistency_groups(issues, members, ai_client,
+                                            max_workers=concurrency, done=resumed)
 
     auto, pending = [], []
     done = [0]
 
-    def _emit(guid, item):
+    def _emit(guid, item, save=True):
         (pending if item.resolution.needs_approval else auto).append(item)
-        if checkpoint is not None:
+        if checkpoint is not None and save:
             checkpoint.save_item(item)
         done[0] += 1
-        codes = [normalize_code(i.code) for i in by_seg[guid]]
-        return Progress(done[0], total_segs, item.tu_id, codes,
+        return Progress(done[0], total_segs, item.tu_id, codes_by_seg[guid],
                         item.problemname, _verdict_label(item.resolution))
 
     ai_queue = []   # [(guid, member, seg_issues)] awaiting a batched AI call
+    answered = {}   # _ai_key -> AI resolution, kept across flushes for the whole run
 
     def _flush_ai_batch():
-        results = (resolve_segment_batch(ai_queue, ai_client, threshold)
-                   if (ai_client is not None and batch_size > 1) else {})
+        results = {}
+        if ai_client is not None and ai_queue:
+            # Repeated segments (same text, tags and codes) are asked once; every
+            # repeat reuses the representative's resolution, including repeats of
+            # a segment answered in an earlier flush.
+            unique, rep_of, first = [], {}, {}
+            for entry in ai_queue:
+                key = _ai_key(entry[1], entry[2])
+                if key in answered:
+                    results[entry[0]] = replace(answered[key])
+                elif key in first:
+                    rep_of[entry[0]] = first[key]
+                else:
+                    first[key] = entry[0]
+                    unique.append(entry)
+            if unique and batch_size > 1:
+                batches = pack_batches(unique, batch_size)
+                results.update(resolve_segment_batches(batches, ai_client, threshold,
+                                                       max_workers=concurrency))
+            elif unique:                # unbatched, but still `concurrency` calls at once
+                results.update(resolve_segments(unique, ai_client, threshold,
+                                                max_workers=concurrency))
+            for key, guid in first.items():
+                res = results.get(guid)
+                # Only real answers are reused; a failed call is asked again next time.
+                if res is not None and not _ai_failed(res):
+                    answered[key] = res
+            for guid, rep in rep_of.items():
+                if rep in results:
+                    results[guid] = replace(results[rep])
+        # A failed AI call is not checkpointed, so a resumed run asks again (and can
+        # pick up a message batch that was still processing).
+        failed = {guid for guid, res in results.items() if _ai_failed(res)}
         events = []
         for guid, member, seg_issues in ai_queue:
             res = _plan_segment(guid, member, seg_issues, ai_client, xseg, threshold,
-                                ai_result=results.get(guid), ignore_all=ignore_all)
-            events.append(_emit(guid, _make_item(guid, member, seg_issues, res)))
+                                ai_result=results.get(guid), ignore_all=ignore_all,
+                                seg_codes=codes_by_seg[guid])
+            events.append(_emit(guid, _make_item(guid, member, seg_issues, res),
+                                save=guid not in failed))
         ai_queue.clear()
         if checkpoint is not None:
-            checkpoint.flush()
+            checkpoint.maybe_flush()
         return events
 
-    for guid in ordered_guids:
-        seg_issues = by_seg[guid]
-        primary = seg_issues[0]
-        member = members.get(guid)
-
-        if checkpoint is not None and checkpoint.has(guid):     # resume: already done
-            yield _emit(guid, checkpoint.get_item(guid))
-            continue
-
-        if member is None:
-            res = Resolution(action="fix", new_target=None, needs_approval=True,
-                             strategy="ai", rationale="segment not found; handle manually.")
-            item = ResolvedItem(item_id=f"{guid}:{primary.code}", segmentguid=guid,
-                                tu_id=primary.tu_id, code=primary.code,
-                                problemname=primary.problemname, source_preview="",
-                                current_target_preview="", proposed_target_preview=None,
-                                resolution=res, issue_count=len(seg_issues))
-            yield _emit(guid, item)
-            continue
-
-        seg_codes = [normalize_code(i.code) for i in seg_issues]
-        if (batch_size > 1 and ai_client is not None
-                and _needs_ai_segment(guid, seg_codes, xseg, ignore_all)):
-            ai_queue.append((guid, member, seg_issues))
-            if len(ai_queue) >= batch_size:
-                for ev in _flush_ai_batch():
-                    yield ev
-            continue
-
-        # deterministic / cached / single-call path -> resolve immediately
-        res = _plan_segment(guid, member, seg_issues, ai_client, xseg, threshold,
-                            ignore_all=ignore_all)
-        yield _emit(guid, _make_item(guid, member, seg_issues, res))
-
-    for ev in _flush_ai_batch():        # last partial batch
-        yield ev
+    try:
+        for guid in ordered_guids:
+            seg_issues = by_seg[guid]
+            primary = seg_issues[0]
+            member = members.get(guid)
+
+            if checkpoint is not None and checkpoint.has(guid):     # resume: already done
+                yield _emit(guid, checkpoint.get_item(guid))
+                continue
+
+            if member is None:
+                res = Resolution(action="fix", new_target=None, needs_approval=True,
+                                 strategy="ai", rationale="segment not found; handle manually.")
+                item = ResolvedItem(item_id=f"{guid}:{primary.code}", segmentguid=guid,
+                                    tu_id=primary.tu_id, code=primary.code,
+                                    problemname=primary.problemname, source_preview="",
+                                    current_target_preview="", proposed_target_preview=None,
+                                    resolution=res, issue_count=len(seg_issues))
+                yield _emit(guid, item)
+                continue
+
+            seg_codes = codes_by_seg[guid]
+            if ai_client is not None and _needs_ai_segment(guid, seg_codes, xseg, ignore_all):
+                ai_queue.append((guid, member, seg_issues))
+                if len(ai_queue) >= batch_size * (flush_batches or max(1, concurrency)):
+                    for ev in _flush_ai_batch():
+                        yield ev
+                continue
+
+            # deterministic / cached / single-call path -> resolve immediately
+            res = _plan_segment(guid, member, seg_issues, ai_client, xseg, threshold,
+                                ignore_all=ignore_all, seg_codes=seg_codes)
+            # a failed Phase A call is not checkpointed either (see _flush_ai_batch)
+            yield _emit(guid, _make_item(guid, member, seg_issues, res),
+                        save=not (guid in xseg and _ai_failed(xseg[guid])))
+
+        for ev in _flush_ai_batch():    # last partial batch
+            yield ev
+    finally:
+        # Also on an abandoned run (gen.close(), a Streamlit rerun): whatever was
+        # saved since the last throttled write still reaches the file.
+        if checkpoint is not None:
+            checkpoint.flush()
 
     session = ReviewSession(src_lang, tgt_lang, auto, pending,
                             report_only=[], total_issues=total_issues)
@@ -247,11 +328,13 @@ def analyze_stream(content: bytes, ai_client=None, glossary=None, threshold=100,
 
 
 def analyze(content: bytes, ai_client=None, glossary=None, threshold=100,
-            batch_size=1, checkpoint=None, ignore_all_codes=None) -> ReviewSession:
+            batch_size=1, checkpoint=None, ignore_all_codes=None,
+            concurrency=1, flush_batches=None) -> ReviewSession:
     """Run the full analysis (no progress callbacks). Built on analyze_stream."""
     gen = analyze_stream(content, ai_client, glossary, threshold,
                          batch_size=batch_size, checkpoint=checkpoint,
-                         ignore_all_codes=ignore_all_codes)
+                         ignore_all_codes=ignore_all_codes, concurrency=concurrency,
+                         flush_batches=flush_batches)
     try:
         while True:
             next(gen)
@@ -300,7 +383,6 @@ def items_for_apply(session, approved_ids, edits=None, ignore_ids=None):
       - ignore (mark false positive): mark every code on the segment ignored, leaving
         the translation untouched.
     apply() also guards against any stray markers as a final backstop."""
-    from xml.sax.saxutils import escape as _xml_escape
     edits = edits or {}
     out = list(session.auto_applied)
     approved_ids = set(approved_ids or ())
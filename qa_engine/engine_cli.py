@@ -1,10 +1,9 @@
 import json
-from .engine import analyze, apply
+from .engine import analyze, apply, session_to_view
 from .glossary import load_glossary
 
 
 def _session_to_dict(rs):
-    from .engine import session_to_view
     return session_to_view(rs)
 
 
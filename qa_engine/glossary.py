@@ -5,10 +5,9 @@ def load_glossary(path):
     table = {}
     with open(path, encoding="utf-8-sig") as fh:
         for line in fh:
-            line = line.rstrip("\n")
-            if not line or "\t" not in line:
+            src, tab, tgt = line.rstrip("\n").partition("\t")
+            if not tab:                             # blank line / no tab
                 continue
-            src, tgt = line.split("\t", 1)
             table[src.strip().lower()] = tgt.strip()
     return table
 
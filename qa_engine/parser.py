@@ -1,3 +1,4 @@
+import io
 from lxml import etree
 from xml.sax.saxutils import escape as _xml_escape
 from .models import Member, Issue
@@ -7,40 +8,96 @@ _XLIFF = "urn:oasis:names:tc:xliff:document:1.2"
 _MQ = "MQXliff"
 _NS = {"x": _XLIFF, "mq": _MQ}
 
+# One shared libxml2 parser. huge_tree lifts libxml2's default size/depth limits,
+# which large project exports can exceed; entities are never expanded.
+_PARSER = etree.XMLParser(huge_tree=True, resolve_entities=False)
+
+# Clark-notation names, built once instead of per trans-unit / per warning.
+_TU = f"{{{_XLIFF}}}trans-unit"
+_FILE = f"{{{_XLIFF}}}file"
+_SOURCE = f"{{{_XLIFF}}}source"
+_TARGET = f"{{{_XLIFF}}}target"
+_INSERTEDMATCH = f"{{{_MQ}}}insertedmatch"
+_ERRORWARNING = f"{{{_MQ}}}errorwarning"
+_SEGGUID = f"{{{_MQ}}}segmentguid"
+_STATUS = f"{{{_MQ}}}status"
+_EW_CODE = f"{{{_MQ}}}errorwarning-code"
+_EW_PROBLEM = f"{{{_MQ}}}errorwarning-problemname"
+_EW_ARGS = f"{{{_MQ}}}errorwarning-localizationargs"
+
 
 def _inner_xml(elem) -> str:
     """Serialize an element's inner content (text + child tags), no outer tag.
 
-    Uses ``with_tail=False`` so that ``etree.tostring`` does not include the
-    child's trailing text, which we then append manually — avoiding the tail
-    being emitted twice.  Namespace declarations injected by lxml when
-    serializing a standalone child element are stripped so the fragments are
-    byte-faithful to the original source.
+    The element is serialized once (``with_tail=False``, so its own tail is not
+    included) and the outer start/end tags are sliced off. Namespace declarations
+    land on that outer tag, so the inner fragment is byte-faithful to the source
+    without any per-child serialization or xmlns stripping.
     """
     if elem is None:
         return ""
-    parts = [_xml_escape(elem.text or "")]
-    for child in elem:
-        frag = etree.tostring(child, encoding="unicode", with_tail=False)
-        frag = frag.replace(' xmlns="urn:oasis:names:tc:xliff:document:1.2"', '')
-        frag = frag.replace(' xmlns:mq="MQXliff"', '')
-        frag = frag.replace(' xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"', '')
-        parts.append(frag)
-        parts.append(_xml_escape(child.tail or ""))
-    return "".join(parts)
+    if len(elem) == 0:                      # no inline tags: just the escaped text
+        return _xml_escape(elem.text or "")
+    xml = etree.tostring(elem, encoding="unicode", with_tail=False)
+    # '>' inside attribute values is serialized as &gt;, so the first '>' closes
+    # the start tag; the element has children, so it ends with an explicit end tag.
+    # tostring writes a carriage return in text as "&#13;"; the tagless path above
+    # (and write-back, which escapes the text again) keeps it as a raw "\r".
+    return xml[xml.index(">") + 1:xml.rindex("</")].replace("&#13;", "\r")
 
 
 def parse_mqxliff(path: str) -> list:
-    tree = etree.parse(path)
-    root = tree.getroot()
-    members = []
-    for tu in root.iter(f"{{{_XLIFF}}}trans-unit"):
+    return _walk(etree.parse(path, _PARSER).getroot().iter(_TU))[0]
+
+
+def _iter_units(content: bytes):
+    """Yield each trans-unit as soon as it is parsed, then free it (and any
+    siblings already read), so the whole document is never held as a tree."""
+    for _, tu in etree.iterparse(io.BytesIO(content), events=("end",), tag=_TU,
+                                 huge_tree=True, resolve_entities=False):
+        yield tu
+        tu.clear()
+        while tu.getprevious() is not None:
+            del tu.getparent()[0]
+
+
+def _unit_parts(tu):
+    """(source, target, insertedmatch, errorwarnings) of a trans-unit from one pass
+    over its children, dispatched by tag. Warnings are only searched for outside
+    <source>/<target>, so inline segment content is never walked for them."""
+    source = target = im = None
+    ews = []
+    for child in tu:
+        tag = child.tag
+        if tag == _SOURCE:
+            if source is None:
+                source = child
+        elif tag == _TARGET:
+            if target is None:
+                target = child
+        elif tag == _ERRORWARNING:
+            ews.append(child)
+        else:
+            if tag == _INSERTEDMATCH and im is None:
+                im = child
+            ews.extend(child.iter(_ERRORWARNING))
+    return source, target, im, ews
+
+
+def _walk(units, flagged_only=False):
+    """Single pass over the trans-units: returns (members, issues). Each
+    <mq:errorwarning> is visited once and feeds both the member's warning_keys
+    and its Issue. With flagged_only, units without a warning are skipped before
+    any serialization or tokenization."""
+    members, issues = [], []
+    for tu in units:
+        source_el, target_el, im, ews = _unit_parts(tu)
+        if flagged_only and not ews:
+            continue
         tu_id = tu.get("id")
-        segguid = tu.get(f"{{{_MQ}}}segmentguid")
-        status = tu.get(f"{{{_MQ}}}status", "")
+        segguid = tu.get(_SEGGUID)
+        status = tu.get(_STATUS, "")
 
-        source_el = tu.find(f"{{{_XLIFF}}}source")
-        target_el = tu.find(f"{{{_XLIFF}}}target")
         src_raw = _inner_xml(source_el)
         tgt_raw = _inner_xml(target_el)
         src_tok, src_map = tokenize(src_raw)
@@ -48,17 +105,20 @@ def parse_mqxliff(path: str) -> list:
 
         # best TM match target, if any
         tm = None
-        im = tu.find(f"{{{_MQ}}}insertedmatch")
         if im is not None:
-            im_tgt = im.find(f"{{{_XLIFF}}}target")
+            im_tgt = im.find(_TARGET)
             if im_tgt is not None:
                 tm = _inner_xml(im_tgt)
 
         warnings = []
-        for ew in tu.iter(f"{{{_MQ}}}errorwarning"):
-            pn = ew.get(f"{{{_MQ}}}errorwarning-problemname", "")
-            args = ew.get(f"{{{_MQ}}}errorwarning-localizationargs", "")
+        for ew in ews:
+            pn = ew.get(_EW_PROBLEM, "")
+            args = ew.get(_EW_ARGS, "")
             warnings.append((pn, args))
+            issues.append(Issue(
+                code=ew.get(_EW_CODE, ""),
+                problemname=pn, args=args, segmentguid=segguid, tu_id=tu_id,
+            ))
 
         members.append(Member(
             tu_id=tu_id, segmentguid=segguid,
@@ -66,40 +126,39 @@ def parse_mqxliff(path: str) -> list:
             source_tags=src_map, target_tags=tgt_map,
             status=status, tm_match=tm, warning_keys=warnings,
         ))
-    return members
+    return members, issues
 
 
 def parse_languages(content: bytes):
-    root = etree.fromstring(content)
-    f = root.find(f"{{{_XLIFF}}}file")
-    if f is None:
-        return None, None
-    return f.get("source-language"), f.get("target-language")
-
-
-def parse_issues(content: bytes):
-    """Return (issues, members_by_guid). One Issue per <mq:errorwarning>."""
-    import tempfile, os
-    # parse_mqxliff takes a path; write bytes to a temp file
-    fd, path = tempfile.mkstemp(suffix=".mqxliff")
-    try:
-        with os.fdopen(fd, "wb") as fh:
-            fh.write(content)
-        members = parse_mqxliff(path)
-    finally:
-        os.unlink(path)
-    by_guid = {m.segmentguid: m for m in members}
-
-    root = etree.fromstring(content)
-    issues = []
-    for tu in root.iter(f"{{{_XLIFF}}}trans-unit"):
-        guid = tu.get(f"{{{_MQ}}}segmentguid")
+    """(source, target) language of the first <file>. Reads only up to that start
+    tag — the attributes are complete there — instead of parsing the document."""
+    for _, f in etree.iterparse(io.BytesIO(content), events=("start",), tag=_FILE,
+                                huge_tree=True, resolve_entities=False):
+        return f.get("source-language"), f.get("target-language")
+    return None, None
+
+
+def parse_issues(content: bytes, flagged_only=False):
+    """Return (issues, members_by_guid). One Issue per <mq:errorwarning>.
+    The document is stream-parsed one trans-unit at a time. members_by_guid holds
+    every unit (the unwarned variants matter when choosing a canonical form);
+    with flagged_only, only units that carry a warning become members — the rest
+    are never tokenized or kept — so memory follows the flagged segments."""
+    members, issues = _walk(_iter_units(content), flagged_only=flagged_only)
+    return issues, {m.segmentguid: m for m in members}
+
+
+def iter_issues(content: bytes):
+    """Stream the Issues of a document without building its tree or tokenizing any
+    segment — for cheap counting (e.g. the code summary shown on upload). Each
+    trans-unit is cleared once read, so memory stays flat on large files."""
+    for tu in _iter_units(content):
+        guid = tu.get(_SEGGUID)
         tu_id = tu.get("id")
-        for ew in tu.iter(f"{{{_MQ}}}errorwarning"):
-            issues.append(Issue(
-                code=ew.get(f"{{{_MQ}}}errorwarning-code", ""),
-                problemname=ew.get(f"{{{_MQ}}}errorwarning-problemname", ""),
-                args=ew.get(f"{{{_MQ}}}errorwarning-localizationargs", ""),
+        for ew in _unit_parts(tu)[3]:
+            yield Issue(
+                code=ew.get(_EW_CODE, ""),
+                problemname=ew.get(_EW_PROBLEM, ""),
+                args=ew.get(_EW_ARGS, ""),
                 segmentguid=guid, tu_id=tu_id,
-            ))
-    return issues, by_guid
+            )
@@ -50,18 +50,18 @@ QA_CODE_DESCRIPTIONS = {
 # Codes still excluded (need AI judgment):
 #   3071–3076 – space missing/extra before/after punctuation sign
 #   3194–3197 – non-breaking space issues
-BULK_SUITABLE_CODES = {
+BULK_SUITABLE_CODES = frozenset({
     "3050",
     "3110",
     "3190",
     "3191",
     "3192",
     "3193",
-}
+})
 
 
 # Tag-structure codes where an automatic fix can corrupt the file; never auto-apply.
-RISKY_CODES = {"1001", "1002", "2004", "2010", "2011", "2015", "2016"}
+RISKY_CODES = frozenset({"1001", "1002", "2004", "2010", "2011", "2015", "2016"})
 
 
 def describe_code(code: str, problemname: str = "") -> str:
@@ -19,6 +19,7 @@ STRATEGY_BY_CODE = {
 
 # Resolver instances are registered here by the engine bootstrap (Task 8).
 _RESOLVERS = {}
+_REPORT_ONLY = ReportOnlyResolver()   # stateless; one shared fallback instance
 
 
 def register_resolver(code: str, resolver):
@@ -26,4 +27,4 @@ def register_resolver(code: str, resolver):
 
 
 def get_resolver(issue):
-    return _RESOLVERS.get(normalize_code(issue.code), ReportOnlyResolver())
+    return _RESOLVERS.get(normalize_code(issue.code), _REPORT_ONLY)
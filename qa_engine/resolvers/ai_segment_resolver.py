@@ -1,9 +1,10 @@
 from xml.sax.saxutils import escape as _xml_escape
+from ..aiclient import resolve_many
 from ..models import Resolution
 from ..tags import detokenize
 from ..taginv import count_parity
 from ..qa_codes import describe_code
-from ..whitespace import align_whitespace, collapse_internal_spaces
+from ..whitespace import ws_candidate
 from .base import normalize_code
 
 SEGMENT_SCHEMA = {
@@ -59,7 +60,7 @@ def _build_user(member, issues):
     for i in issues:
         lines.append(f"- code {i.code}: {describe_code(normalize_code(i.code), i.problemname)}"
                      + (f"  [details: {i.args}]" if i.args else ""))
-    candidate = collapse_internal_spaces(align_whitespace(member.source_text, member.target_text))
+    candidate = ws_candidate(member.source_text, member.target_text)
     lines.append(f"\nSOURCE: {member.source_text}")
     lines.append(f"CURRENT TARGET: {member.target_text}")
     if candidate != member.target_text:
@@ -117,3 +118,19 @@ def resolve_segment(member, issues, context, ai_client, threshold=100) -> Resolu
         return Resolution(action="report", confidence=0.0, needs_approval=True,
                           strategy="ai", rationale=f"AI error: {exc}")
     return resolution_from_ai_data(member, issues, data, threshold)
+
+
+def resolve_segments(items, ai_client, threshold=100, max_workers=1) -> dict:
+    """items: list of (key, member, issues). One single-segment call per item, up to
+    max_workers in flight. Returns {key: Resolution}; a failed call degrades to the
+    same report fallback as resolve_segment, for that item only."""
+    requests = [(_SYSTEM, _build_user(member, issues), SEGMENT_SCHEMA)
+                for _, member, issues in items]
+    out = {}
+    for (key, member, issues), data in zip(items, resolve_many(ai_client, requests, max_workers)):
+        if isinstance(data, Exception):
+            out[key] = Resolution(action="report", confidence=0.0, needs_approval=True,
+                                  strategy="ai", rationale=f"AI error: {data}")
+        else:
+            out[key] = resolution_from_ai_data(member, issues, data, threshold)
+    return out
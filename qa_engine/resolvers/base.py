@@ -1,8 +1,12 @@
+from functools import lru_cache
 from ..models import Resolution
 
 
+@lru_cache(maxsize=None)
 def normalize_code(code: str) -> str:
-    """memoQ codes appear as zero-padded ('03050'); normalize to plain int string."""
+    """memoQ codes appear as zero-padded ('03050'); normalize to plain int string.
+    Memoized: a file has only a handful of distinct codes but calls this several
+    times per issue."""
     try:
         return str(int(code))
     except (TypeError, ValueError):
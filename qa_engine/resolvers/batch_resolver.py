@@ -5,9 +5,10 @@ any segment the model omits — or the whole batch on an API error — falls bac
 needs_approval so nothing is ever silently dropped (conservation)."""
 from .ai_segment_resolver import resolution_from_ai_data, _SYSTEM, SEGMENT_SCHEMA
 from .base import normalize_code
+from ..aiclient import resolve_many
 from ..models import Resolution
 from ..qa_codes import describe_code
-from ..whitespace import align_whitespace, collapse_internal_spaces
+from ..whitespace import ws_candidate
 
 _BATCH_SYSTEM = _SYSTEM + """
 
@@ -45,7 +46,7 @@ def _build_batch_user(items):
         for i in issues:
             lines.append(f"- code {i.code}: {describe_code(normalize_code(i.code), i.problemname)}"
                          + (f"  [details: {i.args}]" if i.args else ""))
-        candidate = collapse_internal_spaces(align_whitespace(member.source_text, member.target_text))
+        candidate = ws_candidate(member.source_text, member.target_text)
         lines.append(f"SOURCE: {member.source_text}")
         lines.append(f"CURRENT TARGET: {member.target_text}")
         if candidate != member.target_text:
@@ -55,20 +56,45 @@ def _build_batch_user(items):
     return "\n".join(lines)
 
 
+# Rough per-batch text budget (source + target characters). The reply echoes every
+# fixed target, so a batch of long segments can overrun the output limit and lose
+# the whole batch; packing by size as well as count keeps each call well inside it.
+MAX_BATCH_CHARS = 6000
+
+
+def pack_batches(items, batch_size, max_chars=MAX_BATCH_CHARS) -> list:
+    """Split items (key, member, issues) into consecutive batches of at most
+    batch_size items and about max_chars of segment text. A single oversized
+    segment still gets a batch of its own."""
+    batches, cur, size = [], [], 0
+    for item in items:
+        member = item[1]
+        n = len(member.source_text) + len(member.target_text)
+        if cur and (len(cur) >= batch_size or size + n > max_chars):
+            batches.append(cur)
+            cur, size = [], 0
+        cur.append(item)
+        size += n
+    if cur:
+        batches.append(cur)
+    return batches
+
+
+# Strategy of a stand-in resolution for a failed AI call or an omitted batch entry,
+# so callers can tell it from a real answer (to not reuse or checkpoint it).
+AI_FALLBACK = "ai_fallback"
+
+
 def _fallback(rationale):
     return Resolution(action="fix", new_target=None, confidence=0.0,
-                      needs_approval=True, strategy="ai", rationale=rationale)
+                      needs_approval=True, strategy=AI_FALLBACK, rationale=rationale)
 
 
-def resolve_segment_batch(items, ai_client, threshold=100) -> dict:
-    """items: list of (key, member, issues). Returns {key: Resolution}. One AI call
-    for the whole batch; omitted segments and API errors -> needs_approval fallback."""
-    if not items:
-        return {}
-    try:
-        data = ai_client.resolve(_BATCH_SYSTEM, _build_batch_user(items), BATCH_SCHEMA)
-    except Exception as exc:
-        return {key: _fallback(f"AI batch error: {exc}") for key, _, _ in items}
+def _resolutions_from_batch(items, data, threshold):
+    """Map one batch response (or the exception its call raised) back to
+    {key: Resolution} for every item in that batch."""
+    if isinstance(data, Exception):
+        return {key: _fallback(f"AI batch error: {data}") for key, _, _ in items}
 
     by_id = {}
     for entry in data.get("segments", []):
@@ -84,3 +110,28 @@ def resolve_segment_batch(items, ai_client, threshold=100) -> dict:
         else:
             out[key] = resolution_from_ai_data(member, issues, entry, threshold)
     return out
+
+
+def resolve_segment_batch(items, ai_client, threshold=100) -> dict:
+    """items: list of (key, member, issues). Returns {key: Resolution}. One AI call
+    for the whole batch; omitted segments and API errors -> needs_approval fallback."""
+    if not items:
+        return {}
+    try:
+        data = ai_client.resolve(_BATCH_SYSTEM, _build_batch_user(items), BATCH_SCHEMA)
+    except Exception as exc:
+        data = exc
+    return _resolutions_from_batch(items, data, threshold)
+
+
+def resolve_segment_batches(batches, ai_client, threshold=100, max_workers=1) -> dict:
+    """Several batches at once: batches is a list of item lists (each as for
+    resolve_segment_batch). The batch calls are independent, so up to max_workers
+    run concurrently. Returns the merged {key: Resolution}; a failing batch falls
+    back on its own without affecting the others."""
+    batches = [b for b in batches if b]
+    requests = [(_BATCH_SYSTEM, _build_batch_user(b), BATCH_SCHEMA) for b in batches]
+    out = {}
+    for items, data in zip(batches, resolve_many(ai_client, requests, max_workers)):
+        out.update(_resolutions_from_batch(items, data, threshold))
+    return out
@@ -1,3 +1,4 @@
+from xml.sax.saxutils import escape as _esc
 from ..models import Resolution
 from ..casebuilder import build_cases
 from ..context import build_case_payload
@@ -47,7 +48,6 @@ def resolve_inconsistencies(issues, members_by_guid, ai_client, glossary):
             wanted = {d["source_key"]: d["new_target"] for d in decision.differentiated}
             for m in case.members:
                 if m.source_text in wanted:
-                    from xml.sax.saxutils import escape as _esc
                     try:
                         new_inner = detokenize(_esc(wanted[m.source_text]), m.target_tags)
                     except ValueError:
@@ -8,11 +8,14 @@ per-segment decision (segmentguid -> Resolution) that fixes every member to that
 canonical form. The engine applies these decisions as the single writer.
 """
 from xml.sax.saxutils import escape as _xml_escape
+from ..aiclient import resolve_many
 from ..models import Resolution
 from ..tags import detokenize
 from .base import normalize_code
+from .batch_resolver import AI_FALLBACK
+from .inconsistency_resolver import _CONF
 
-XSEG_CODES = {"3100", "3101"}
+XSEG_CODES = frozenset({"3100", "3101"})
 
 XSEG_SCHEMA = {
     "type": "object",
@@ -69,48 +72,51 @@ def _norm_source(text: str) -> str:
     return (text or "").strip(_NORM_STRIP).casefold()
 
 
-def resolve_inconsistency_groups(issues, members_by_guid, ai_client) -> dict:
+def resolve_inconsistency_groups(issues, members_by_guid, ai_client, max_workers=1,
+                                 done=frozenset()) -> dict:
     """Group flagged members by NORMALIZED source, pick a canonical target per
     group, and return {segmentguid: Resolution} for every member of a group that
     actually needs unifying (more than one distinct target). Groups already
-    consistent are left out (the engine handles them / they re-QA clean)."""
+    consistent are left out (the engine handles them / they re-QA clean), as are
+    groups whose members are all in `done` (e.g. resumed from a checkpoint).
+    Groups are independent, so up to max_workers of their AI calls run at once."""
     # segments carrying a 3100/3101 issue, de-duplicated, in first-seen order
-    flagged, seen = [], set()
-    for i in issues:
-        if normalize_code(i.code) in XSEG_CODES and i.segmentguid not in seen:
-            seen.add(i.segmentguid)
-            flagged.append(i.segmentguid)
-
+    flagged = dict.fromkeys(i.segmentguid for i in issues if normalize_code(i.code) in XSEG_CODES)
     groups = {}
     for guid in flagged:
         m = members_by_guid.get(guid)
         if m is not None:
             groups.setdefault(_norm_source(m.source_text), []).append(m)
 
-    out = {}
+    pending, requests = [], []
     for _key, members in groups.items():
         distinct = {m.target_text for m in members}
         if len(distinct) <= 1:
             continue  # already consistent — nothing to unify
+        if all(m.segmentguid in done for m in members):
+            continue  # every member already decided — don't pay for it again
         source = members[0].source_text   # a real representative source for the prompt
         # variant -> count, most common first (gives the AI document-frequency signal)
         counts = {}
         for m in members:
             counts[m.target_text] = counts.get(m.target_text, 0) + 1
         variants = sorted(counts.items(), key=lambda kv: -kv[1])
+        pending.append(members)
+        requests.append((_SYSTEM, _build_user(source, variants), XSEG_SCHEMA))
 
-        try:
-            data = ai_client.resolve(_SYSTEM, _build_user(source, variants), XSEG_SCHEMA)
-        except Exception as exc:
+    out = {}
+    for members, data in zip(pending, resolve_many(ai_client, requests, max_workers)):
+        if isinstance(data, Exception):
             for m in members:
                 out[m.segmentguid] = Resolution(
-                    action="fix", new_target=None, needs_approval=True, strategy="ai",
-                    rationale=f"AI error choosing canonical form: {exc}")
+                    action="fix", new_target=None, needs_approval=True, strategy=AI_FALLBACK,
+                    rationale=f"AI error choosing canonical form: {data}")
             continue
 
         canonical = data.get("canonical_target", "")
-        conf = {"high": 0.95, "medium": 0.6, "low": 0.3}.get(data.get("confidence"), 0.3)
-        auto = data.get("auto_apply", False) and data.get("confidence") == "high"
+        level = data.get("confidence")
+        conf = _CONF.get(level, 0.3)
+        auto = data.get("auto_apply", False) and level == "high"
         rationale = data.get("rationale", "")
         for m in members:
             new_inner, ok = _detok(canonical, m.target_tags)
@@ -1,5 +1,5 @@
 from ..models import Resolution
-from ..whitespace import align_whitespace, collapse_internal_spaces
+from ..whitespace import ws_candidate
 from ..tags import detokenize, _TOKEN_RE
 from .base import Resolver
 
@@ -13,7 +13,7 @@ class WhitespaceResolver(Resolver):
     strategy = "deterministic"
 
     def resolve(self, issue, member, context) -> Resolution:
-        new_tok = collapse_internal_spaces(align_whitespace(member.source_text, member.target_text))
+        new_tok = ws_candidate(member.source_text, member.target_text)
         if new_tok == member.target_text:
             return Resolution(
                 action="report", new_target=None, confidence=1.0,
@@ -15,9 +15,12 @@ target's existing tag ids.
 import re
 from .tags import tag_label, detokenize, _TOKEN_RE
 from .taginv import tag_multiset
+from .resolvers.base import normalize_code as _norm
 
-TAG_STRUCTURE_CODES = {"2010", "2011", "2015", "2016"}
+TAG_STRUCTURE_CODES = frozenset({"2010", "2011", "2015", "2016"})
 _ID_RE = re.compile(r'(\bid=")[^"]*(")')
+# Openings of tags with no open/close pairing; one tuple startswith() tests all.
+_SELF_CONTAINED = ("<ph", "<x", "<mq:ch")
 
 
 def _kind_of(token: str) -> str:
@@ -29,30 +32,25 @@ def _kinds(tok_text: str):
     return [_kind_of(m.group(0)) for m in _TOKEN_RE.finditer(tok_text or "")]
 
 
-def _norm(c):
-    try:
-        return str(int(c))
-    except (TypeError, ValueError):
-        return c or ""
-
-
 def _self_contained(xml: str) -> bool:
-    s = xml.lstrip()
-    return s.startswith("<ph") or s.startswith("<x") or s.startswith("<mq:ch")
+    return xml.lstrip().startswith(_SELF_CONTAINED)
 
 
 def _renumber(xml: str, new_id: int) -> str:
     return _ID_RE.sub(lambda m: f"{m.group(1)}{new_id}{m.group(2)}", xml, count=1)
 
 
-def _build_ordered_target(member):
+def _build_ordered_target(member, src_ms=None, tgt_ms=None):
     """Corrected target XML for a 2011 (missing-tag) segment: the missing tags are
     re-inserted in their SOURCE-relative ORDER (not appended at the end — appending
     fixes the count but trips memoQ's 2016 order check). Returns the XML, or None
     when it can't be done safely (extra tags, paired/non-self-contained missing
-    tags, or the target's tag order isn't a subsequence of the source's)."""
-    src_ms = tag_multiset(member.source_text)
-    tgt_ms = tag_multiset(member.target_text)
+    tags, or the target's tag order isn't a subsequence of the source's). The
+    caller may pass the source/target tag multisets it has already counted."""
+    if src_ms is None:
+        src_ms = tag_multiset(member.source_text)
+    if tgt_ms is None:
+        tgt_ms = tag_multiset(member.target_text)
     missing = src_ms - tgt_ms
     extra = tgt_ms - src_ms
     if extra or not missing:
@@ -123,13 +121,16 @@ def plan_tag_structure(member, tag_codes):
     """
     codes = {_norm(c) for c in tag_codes}
     ignore_codes, new_target_xml, remaining = [], None, []
-    parity = tag_multiset(member.source_text) == tag_multiset(member.target_text)
+    # counted once per segment, shared by the 2016 parity test and the 2011 fix
+    src_ms = tag_multiset(member.source_text)
+    tgt_ms = tag_multiset(member.target_text)
+    parity = src_ms == tgt_ms
 
     for code in sorted(codes):
         if code == "2016":
             (ignore_codes if parity else remaining).append("2016")
         elif code == "2011":
-            built = _build_ordered_target(member)
+            built = _build_ordered_target(member, src_ms, tgt_ms)
             if built is not None:
                 new_target_xml = built
             else:
@@ -10,7 +10,7 @@ which is stable across reordering; volatile numeric ids are ignored.
 import re
 from collections import Counter
 
-_TOKEN_RE = re.compile(r"⟦\d+:(.*?)⟧")
+_TOKEN_RE = re.compile(r"⟦\d+:([^⟧\n]*)⟧")
 
 
 def tag_multiset(tok_text: str) -> Counter:
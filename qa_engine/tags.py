@@ -1,5 +1,6 @@
 import re
 import html
+from functools import lru_cache
 
 _TAG_RE = re.compile(
     r'<bpt\b[^>]*>.*?</bpt>'
@@ -14,15 +15,20 @@ _TAG_RE = re.compile(
 )
 
 _OPEN, _CLOSE = "⟦", "⟧"
-# token: ⟦<id>:<label>⟧ — id is authoritative, label is decorative/readable
-_TOKEN_RE = re.compile(_OPEN + r"(\d+):.*?" + _CLOSE)
+# token: ⟦<id>:<label>⟧ — id is authoritative, label is decorative/readable.
+# The label is a negated class rather than a lazy .*?, so a scan never backtracks.
+_TOKEN_RE = re.compile(_OPEN + r"(\d+):[^" + _CLOSE + r"\n]*" + _CLOSE)
+# same token with the label captured, for rendering chips via a plain template
+_TOKEN_LABEL_RE = re.compile(_OPEN + r"\d+:([^" + _CLOSE + r"\n]*)" + _CLOSE)
 _CATALOG_RE = re.compile(r'mmq78catalogvalue=(?:&quot;|")(.*?)(?:&quot;|")')
 _NAME_RE = re.compile(r'</?\s*([A-Za-z][\w:.-]*)')
 
 
+@lru_cache(maxsize=4096)
 def tag_label(tag_xml: str) -> str:
     """memoQ-style readable label for an inline tag, from mmq78catalogvalue
-    (double-unescaped); fall back to the tag's local name."""
+    (double-unescaped); fall back to the tag's local name. Memoized: a document
+    reuses a small set of formatting tags across thousands of segments."""
     m = _CATALOG_RE.search(tag_xml)
     if m:
         lbl = html.unescape(html.unescape(m.group(1))).strip()
@@ -59,7 +65,7 @@ def to_chips(text: str) -> str:
     """Render a segment for human display: inline tags (raw XML or ⟦id:label⟧
     tokens) become memoQ-style chips like [<cf size=9.5>] / [</strong>]. Used by
     the UI only — never for the write-back path."""
-    text = _TOKEN_RE.sub(lambda m: f"[{m.group(0).split(':', 1)[1][:-1]}]", text)
+    text = _TOKEN_LABEL_RE.sub(r"[\1]", text)
     return _TAG_RE.sub(lambda m: f"[{tag_label(m.group(0))}]", text)
 
 
@@ -1,9 +1,9 @@
 import re
+from functools import lru_cache
 from .tags import detokenize
 
-_MARK = re.compile(r'⟦\d+:.*?⟧')
-_LEAD = re.compile(r'^[ \t]*')
-_TRAIL = re.compile(r'[ \t]*$')
+_MARK = re.compile(r'(⟦\d+:[^⟧\n]*⟧)')   # captured: split() keeps the markers
+_WS = " \t"                             # the edge whitespace aligned to the source
 _RUN = re.compile(r'[ \t]{2,}')
 
 
@@ -15,36 +15,46 @@ def collapse_internal_spaces(text: str) -> str:
 
 
 def lead_ws(text: str) -> str:
-    return _LEAD.match(text).group(0)
+    return text[:len(text) - len(text.lstrip(_WS))]
 
 
 def trail_ws(text: str) -> str:
-    return _TRAIL.search(text).group(0)
+    return text[len(text.rstrip(_WS)):]
 
 
 def _split(tok: str):
-    """(text_parts[n+1], markers[n]) for a tokenized string."""
-    return _MARK.split(tok), _MARK.findall(tok)
+    """(text_parts[n+1], markers[n]) for a tokenized string, from one scan:
+    the capturing split alternates text, marker, text, ..."""
+    parts = _MARK.split(tok)
+    return parts[::2], parts[1::2]
 
 
+@lru_cache(maxsize=4096)
 def align_whitespace(src_tok: str, tgt_tok: str) -> str:
     """Set each inter-tag text run's leading/trailing [ \\t] in the target equal
     to the source's corresponding run. Returns the target unchanged when the
     marker counts differ (cannot safely align). Inter-word spaces and non-[ \\t]
-    characters (e.g. nbsp) are preserved."""
+    characters (e.g. nbsp) are preserved. Memoized: the same segment is aligned by
+    fix detection, normalization and whichever resolver plans it."""
     s_parts, s_marks = _split(src_tok)
     t_parts, t_marks = _split(tgt_tok)
     if len(s_marks) != len(t_marks):
         return tgt_tok
-    new_parts = []
+    # text runs and markers interleaved into one list, joined once at the end
+    out = []
     for i, t in enumerate(t_parts):
+        if i:
+            out.append(t_marks[i - 1])
         s = s_parts[i]
-        core = _TRAIL.sub('', _LEAD.sub('', t))
-        new_parts.append(lead_ws(s) + core + trail_ws(s))
-    out = new_parts[0]
-    for mk, part in zip(t_marks, new_parts[1:]):
-        out += mk + part
-    return out
+        # str.strip edges instead of four regex passes per run
+        out.append(lead_ws(s) + t.strip(_WS) + trail_ws(s))
+    return "".join(out)
+
+
+def ws_candidate(src_tok: str, tgt_tok: str) -> str:
+    """The deterministic whitespace fix for a target: tag-boundary/edge whitespace
+    aligned to the source and internal multi-space runs collapsed."""
+    return collapse_internal_spaces(align_whitespace(src_tok, tgt_tok))
 
 
 def compute_ws_fixes(members: list) -> list:
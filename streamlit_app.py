@@ -1,17 +1,23 @@
 import os
+import time
 import streamlit as st
 
 from collections import Counter
+from dataclasses import dataclass, field
 
 from qa_engine.engine import analyze_stream, apply, session_to_view, items_for_apply
-from qa_engine.aiclient import ClaudeAIClient
+from qa_engine.aiclient import ClaudeAIClient, ClaudeBatchAIClient, CachingAIClient, AnswerCache
 from qa_engine.tags import to_chips
 from qa_engine.checkpoint import Checkpoint, content_key
-from qa_engine.parser import parse_issues
+from qa_engine.parser import iter_issues
 from qa_engine.qa_codes import describe_code
 from qa_engine.resolvers.base import normalize_code
 
 CACHE_DIR = ".qa_cache"
+UI_INTERVAL = 0.1          # seconds between progress redraws
+# progress verdict -> status-line label, built once rather than per event
+VERDICT_LABELS = {"fix": "✅ fixed", "ignore": "➖ ignored (false positive)",
+                  "needs_approval": "🟡 needs approval"}
 
 st.set_page_config(page_title="memoQ QA Resolver", layout="wide")
 st.title("memoQ QA Resolver")
@@ -35,26 +41,104 @@ batch_size = st.sidebar.slider("Segments per AI call (batch size)", min_value=1,
                                value=12,
                                help="Higher = far fewer API calls on big files (much faster, "
                                     "resilient to timeouts). Lower if a call ever gets too large.")
+concurrency = st.sidebar.slider("Parallel AI calls", min_value=1, max_value=8, value=4,
+                                help="How many batch calls run at the same time. Higher finishes "
+                                     "big files sooner; lower if the API reports rate limits.")
+# Small files keep the interactive path; a message batch only pays off on big ones.
+BATCH_API_MIN_ISSUES = 500
+# Segment batches per message batch. Every submission is waited for before the
+# next is sent, so a run takes (submissions × batch latency): group enough that
+# most files go out in one, well under the API's per-batch limits. Its id is kept
+# until the results are read, so a rerun resumes it rather than resubmitting.
+BATCH_API_GROUP = 500
+_BATCH_LARGE = f"Files over {BATCH_API_MIN_ISSUES} issues"
+batch_api_mode = st.sidebar.radio(
+    "Use Message Batches API (half price, slower)", ["Off", _BATCH_LARGE, "Always"],
+    help="Sends the AI work as message batches: 50% cheaper and not rate-limited, but each "
+         "group of segments can take several minutes. Best for large unattended files.")
 st.sidebar.caption("Without a key, only deterministic fixes (whitespace, safe tag rules) run; "
                    "everything needing judgement waits for approval. Progress is checkpointed — "
                    "if the page reloads mid-run, re-run the same file to resume from where it stopped.")
 
+
+@dataclass
+class Job:
+    """An analysis started by the Analyze button. Kept in session_state so a rerun
+    (or a dropped connection) resumes it from the on-disk checkpoint."""
+    content: bytes
+    key: str                          # checkpoint name: content hash + bulk-ignored codes
+    threshold: int
+    batch_size: int
+    use_batch_api: bool
+    concurrency: int
+    use_ai: bool
+    api_key: str
+    ignore_all_codes: list = field(default_factory=list)
+    flush_batches: int = 0            # segment batches per AI submission; 0 = concurrency
+    running: bool = True
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def issue_summary(file_id: str, _content: bytes):
+    """(issue count, per-code counts, a problem name per code, segment count) of an
+    upload; the count is None when the file could not be read. Every widget click
+    reruns this script, so it is cached per upload: keyed on the uploader's file_id
+    (the underscore keeps Streamlit from re-hashing the whole file on each rerun)."""
+    counts, probname, segs = Counter(), {}, set()
+    n = 0
+    try:
+        for i in iter_issues(_content):           # one streamed pass over the issues
+            c = normalize_code(i.code)
+            counts[c] += 1
+            probname.setdefault(c, i.problemname)
+            segs.add(i.segmentguid)
+            n += 1
+    except Exception:
+        return None, Counter(), {}, 0
+    return n, counts, probname, len(segs)
+
+
+@st.cache_resource(show_spinner=False)
+def answer_cache():
+    """The one store behind every AI client: they all write the same file, so they
+    share its lock and its size cap."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    return AnswerCache(os.path.join(CACHE_DIR, "ai_cache.jsonl"))
+
+
+@st.cache_resource(show_spinner=False)
+def ai_client_for(api_key: str, use_batch_api: bool):
+    """One AI client per key and mode for the whole server: its HTTP connection
+    pool and rate limiter outlive script reruns and jobs; answers go to the shared
+    answer_cache()."""
+    import anthropic
+    # Optional per-minute request cap for accounts on a low rate-limit tier.
+    max_rpm = int(os.environ.get("ANTHROPIC_MAX_RPM", "0")) or None
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    # The client retries transient errors itself; SDK retries on top would multiply them.
+    sdk = anthropic.Anthropic(api_key=api_key, max_retries=0)
+    if use_batch_api:
+        # In-flight batch ids live next to the checkpoints: a rerun of the same
+        # file resumes its pending batch instead of paying for it again.
+        client = ClaudeBatchAIClient(sdk, max_rpm=max_rpm,
+                                     state_path=os.path.join(CACHE_DIR, "batches.json"))
+    else:
+        client = ClaudeAIClient(sdk, max_rpm=max_rpm)
+    # Identical prompts (repeated segments, re-runs of a file) reuse the stored answer.
+    return CachingAIClient(client, cache=answer_cache())
+
+
 uploaded = st.file_uploader("memoQ .mqxliff", type=["mqxliff"])
 
 # On upload, show the code distribution and let the user bulk-ignore whole codes.
 ignore_all_sel = []
+n_issues = 0
 if uploaded is not None:
-    peek = uploaded.getvalue()                       # getvalue() doesn't consume the buffer
-    try:
-        _issues, _ = parse_issues(peek)
-    except Exception:
-        _issues = []
-    counts = Counter(normalize_code(i.code) for i in _issues)
-    probname = {}
-    for i in _issues:
-        probname.setdefault(normalize_code(i.code), i.problemname)
+    # getvalue() neither consumes nor copies the upload; read it once per run
+    upload_bytes = uploaded.getvalue()
+    n_issues, counts, probname, n_segs = issue_summary(uploaded.file_id, upload_bytes)
     if counts:
-        st.caption(f"{len(_issues)} issues across {len({i.segmentguid for i in _issues})} segments.")
+        st.caption(f"{n_issues} issues across {n_segs} segments.")
         labels = {f"{c} — {describe_code(c, probname.get(c, ''))} ({n})": c
                   for c, n in sorted(counts.items(), key=lambda kv: -kv[1])}
         chosen = st.multiselect(
@@ -63,44 +147,60 @@ if uploaded is not None:
             help="Use for codes you know are all false positives (e.g. 03050 when the double "
                  "spaces are intentional). Every segment carrying these codes is marked ignored in bulk.")
         ignore_all_sel = sorted({labels[c] for c in chosen})
+    elif n_issues == 0:
+        st.success("This file has no QA warnings — nothing to resolve.")
 
 # Clicking Analyze records a persistent job (survives reruns) so a dropped
 # connection resumes from the on-disk checkpoint instead of restarting.
-if uploaded is not None and st.button("Analyze QA issues", type="primary"):
-    content = uploaded.getvalue()
+# A file with no warnings never starts a job (no parse, no AI client); one that
+# could not be read still may, so the analysis reports the actual error.
+if uploaded is not None and n_issues != 0 and st.button("Analyze QA issues", type="primary"):
+    content = upload_bytes
     key = content_key(content) + ("_" + "_".join(ignore_all_sel) if ignore_all_sel else "")
-    st.session_state["job"] = {
-        "content": content, "key": key, "threshold": threshold,
-        "batch_size": batch_size, "use_ai": use_ai, "api_key": api_key,
-        "ignore_all_codes": ignore_all_sel, "running": True,
-    }
+    use_batch_api = batch_api_mode == "Always" or (
+        batch_api_mode == _BATCH_LARGE and (n_issues or 0) > BATCH_API_MIN_ISSUES)
+    st.session_state["job"] = Job(
+        content=content, key=key, threshold=threshold,
+        batch_size=batch_size, use_batch_api=use_batch_api,
+        concurrency=concurrency, use_ai=use_ai, api_key=api_key,
+        ignore_all_codes=ignore_all_sel,
+        flush_batches=BATCH_API_GROUP if use_batch_api else 0,
+    )
     st.session_state.pop("rs", None)
+    st.session_state.pop("review", None)
 
 job = st.session_state.get("job")
-if job and job.get("running"):
+if job and job.running:
+    os.makedirs(CACHE_DIR, exist_ok=True)
     ai_client = None
-    if job["use_ai"] and job["api_key"]:
-        import anthropic
-        ai_client = ClaudeAIClient(anthropic.Anthropic(api_key=job["api_key"]))
+    if job.use_ai and job.api_key:
+        ai_client = ai_client_for(job.api_key, job.use_batch_api)
 
-    os.makedirs(CACHE_DIR, exist_ok=True)
-    ckpt = Checkpoint(os.path.join(CACHE_DIR, job["key"] + ".json"))
+    ckpt = Checkpoint(os.path.join(CACHE_DIR, job.key + ".jsonl"))
     resumed = len(ckpt.all_items())
     if resumed:
         st.info(f"Resuming — {resumed} segments already done are loaded from the checkpoint.")
 
     bar = st.progress(0.0)
     status = st.empty()
-    gen = analyze_stream(job["content"], ai_client=ai_client, glossary={},
-                         threshold=job["threshold"], batch_size=job["batch_size"],
-                         checkpoint=ckpt, ignore_all_codes=job.get("ignore_all_codes"))
+    gen = analyze_stream(job.content, ai_client=ai_client, glossary={},
+                         threshold=job.threshold, batch_size=job.batch_size,
+                         checkpoint=ckpt, ignore_all_codes=job.ignore_all_codes,
+                         concurrency=job.concurrency,
+                         flush_batches=job.flush_batches or None)
     rs = None
+    last_ui = 0.0
     try:
         while True:
             p = next(gen)
+            # Each UI call is a websocket message; segments resolved from the
+            # checkpoint or deterministically arrive far faster than 10 per second.
+            now = time.monotonic()
+            if now - last_ui < UI_INTERVAL and p.index != p.total:
+                continue
+            last_ui = now
             bar.progress(p.index / p.total if p.total else 1.0)
-            verdict = {"fix": "✅ fixed", "ignore": "➖ ignored (false positive)",
-                       "needs_approval": "🟡 needs approval"}.get(p.verdict, p.verdict)
+            verdict = VERDICT_LABELS.get(p.verdict, p.verdict)
             status.markdown(f"**{p.index}/{p.total}** · segment {p.tu_id} · "
                             f"`{', '.join(p.codes)}` · {p.problem} → {verdict}")
     except StopIteration as stop:
@@ -109,19 +209,51 @@ if job and job.get("running"):
     status.markdown(f"Done — checked {rs.total_issues} issues across "
                     f"{len(rs.auto_applied) + len(rs.pending)} segments.")
     st.session_state["rs"] = rs
-    st.session_state["content"] = job["content"]
-    job["running"] = False
+    st.session_state["content"] = job.content
+    job.running = False
 
 
-def render(rs):
+def review_model(rs) -> dict:
+    """What the review section shows that depends only on the finished session —
+    ledger totals, table rows and chip-rendered texts — built once per analysis
+    instead of on every decision click."""
     view = session_to_view(rs)
-    auto_fixes = [r for r in view["auto_applied"] if r["action"] != "ignore"]
-    auto_ignores = [r for r in view["auto_applied"] if r["action"] == "ignore"]
+    pending_items = {it.item_id: it for it in rs.pending}
+    pending = []
+    for r in view["pending"]:
+        it = pending_items.get(r["item_id"])
+        has_fix = r["proposed_target"] is not None and r["action"] == "fix"
+        # one text element per segment instead of one per line
+        lines = [f"Source:   {to_chips(r['source'])}",
+                 f"Current:  {to_chips(r['current_target'])}"]
+        if has_fix:
+            lines.append(f"Proposed: {to_chips(r['proposed_target'])}")
+        pending.append({
+            "row": r, "has_fix": has_fix, "text": "\n".join(lines),
+            "seed": it.proposed_tokens if it is not None else (r["proposed_target"] or ""),
+        })
+    return {
+        # --- Reconciliation (issues = the one unit; every issue is accounted for) ---
+        "fixed_n": sum(it.issue_count for it in rs.auto_applied
+                       if it.resolution.action != "ignore"),
+        "ignored_n": sum(it.issue_count for it in rs.auto_applied
+                         if it.resolution.action == "ignore"),
+        "pending_n": sum(it.issue_count for it in rs.pending),
+        "fix_rows": [{"code": r["code"], "segment": r["tu_id"],
+                      "before": to_chips(r["current_target"]),
+                      "after": to_chips(r["proposed_target"] or "")}
+                     for r in view["auto_applied"] if r["action"] != "ignore"],
+        "ignore_rows": [{"code": r["code"], "segment": r["tu_id"], "rationale": r["rationale"]}
+                        for r in view["auto_applied"] if r["action"] == "ignore"],
+        "pending": pending,
+    }
+
 
-    # --- Reconciliation header (issues = the one unit; every issue is accounted for) ---
-    fixed_n = sum(it.issue_count for it in rs.auto_applied if it.resolution.action != "ignore")
-    ignored_n = sum(it.issue_count for it in rs.auto_applied if it.resolution.action == "ignore")
-    pending_n = sum(it.issue_count for it in rs.pending)
+# A fragment: the per-segment decision widgets rerun only this review section, not
+# the upload summary and sidebar above it.
+@st.fragment
+def render(rs, model):
+    fixed_n, ignored_n, pending_n = model["fixed_n"], model["ignored_n"], model["pending_n"]
     st.info(f"**{rs.total_issues}** QA issues  =  **{fixed_n}** auto-corrected  +  "
             f"**{ignored_n}** ignored (false positive, translation kept)  +  "
             f"**{pending_n}** need your input")
@@ -133,40 +265,31 @@ def render(rs):
     c2.metric("Ignored (false positive)", ignored_n)
     c3.metric("Need your input", pending_n)
 
-    with st.expander(f"Auto-corrected ({len(auto_fixes)} segments)"):
-        st.dataframe([{"code": r["code"], "segment": r["tu_id"],
-                       "before": to_chips(r["current_target"]),
-                       "after": to_chips(r["proposed_target"] or "")}
-                      for r in auto_fixes], use_container_width=True)
+    with st.expander(f"Auto-corrected ({len(model['fix_rows'])} segments)"):
+        st.dataframe(model["fix_rows"], use_container_width=True)
 
-    with st.expander(f"Ignored — false positive, translation kept ({len(auto_ignores)} segments)"):
-        st.dataframe([{"code": r["code"], "segment": r["tu_id"], "rationale": r["rationale"]}
-                      for r in auto_ignores], use_container_width=True)
+    with st.expander(f"Ignored — false positive, translation kept ({len(model['ignore_rows'])} segments)"):
+        st.dataframe(model["ignore_rows"], use_container_width=True)
 
-    st.subheader(f"Need your input ({len(view['pending'])} segments)")
+    st.subheader(f"Need your input ({len(model['pending'])} segments)")
     st.caption("For each segment pick one: **Confirm AI fix** · **Ignore (false positive)** · "
                "**Apply my edit**. Inline tags show as chips like `[<cf size=9.5>]`; in the edit box "
                "they appear as `⟦id:tag⟧` — change the wording freely but keep every `⟦…⟧` marker.")
-    pending_items = {it.item_id: it for it in rs.pending}
     approved_ids = set()
     ignore_ids = set()
     edits = {}
-    for r in view["pending"]:
-        it = pending_items.get(r["item_id"])
-        has_fix = r["proposed_target"] is not None and r["action"] == "fix"
+    for p in model["pending"]:
+        r, has_fix = p["row"], p["has_fix"]
         with st.expander(f"[{r['code']}] segment {r['tu_id']} — {r['problemname']}"):
-            st.text(f"Source:   {to_chips(r['source'])}")
-            st.text(f"Current:  {to_chips(r['current_target'])}")
-            if has_fix:
-                st.text(f"Proposed: {to_chips(r['proposed_target'])}")
+            st.text(p["text"])
             st.caption(r["rationale"])
             options = ["Leave for later"]
             if has_fix:
                 options.append("Confirm AI fix")
             options += ["Ignore (false positive)", "Apply my edit"]
             choice = st.radio("Decision", options, horizontal=True, key=f"dec_{r['item_id']}")
-            seed = it.proposed_tokens if it is not None else (r["proposed_target"] or "")
-            new = st.text_area("Edit (keep the ⟦…⟧ tags)", value=seed, key=f"edit_{r['item_id']}")
+            new = st.text_area("Edit (keep the ⟦…⟧ tags)", value=p["seed"],
+                               key=f"edit_{r['item_id']}")
             if choice == "Confirm AI fix":
                 approved_ids.add(r["item_id"])               # apply precomputed AI target
             elif choice == "Ignore (false positive)":
@@ -187,12 +310,18 @@ def render(rs):
             applied_issues = sum(it.issue_count for it in items)
             st.success(f"Built corrected file: {applied_issues} issues resolved "
                        f"({fixed_n + ignored_n} automatic + {len(approved_ids)} approved segments).")
+            # The bytes are already built and validated above. "ignore" serves them
+            # without a rerun, which would rebuild the whole review page and drop
+            # this button along with the file.
             st.download_button("Download corrected .mqxliff", data=fixed,
-                               file_name="FIXED.mqxliff", mime="application/xml")
+                               file_name="FIXED.mqxliff", mime="application/xml",
+                               on_click="ignore")
 
 
 rs = st.session_state.get("rs")
 if rs is None:
     st.info("Upload a file and click **Analyze QA issues** to begin.")
 else:
-    render(rs)
+    if "review" not in st.session_state:           # once per finished analysis
+        st.session_state["review"] = review_model(rs)
+    render(rs, st.session_state["review"])
@@ -1,5 +1,7 @@
 import json
-from qa_engine.aiclient import ClaudeAIClient
+import pytest
+from qa_engine.aiclient import (ClaudeAIClient, ClaudeBatchAIClient, CachingAIClient,
+                                 AnswerCache, resolve_many, _RateLimiter)
 
 
 class _FakeAnthropic:
@@ -21,3 +23,209 @@ def test_claude_client_resolve_builds_request_and_parses():
     assert kw["thinking"] == {"type": "adaptive"}
     assert kw["output_config"]["format"]["schema"] == {"type": "object"}
     assert kw["system"][0]["cache_control"] == {"type": "ephemeral"}
+
+
+class _Echo:
+    def resolve(self, system, user, schema):
+        if user == "boom":
+            raise RuntimeError("down")
+        return {"user": user}
+
+
+def test_resolve_many_keeps_order_and_captures_errors():
+    reqs = [("s", u, {}) for u in ("a", "boom", "c")]
+    for workers in (1, 3):
+        out = resolve_many(_Echo(), reqs, max_workers=workers)
+        assert out[0] == {"user": "a"} and out[2] == {"user": "c"}
+        assert isinstance(out[1], RuntimeError)
+
+
+class _Counting:
+    model = "m"
+    def __init__(self):
+        self.calls = 0
+    def resolve(self, system, user, schema):
+        self.calls += 1
+        return {"n": self.calls}
+
+
+def test_caching_client_memoizes_and_persists(tmp_path):
+    path = str(tmp_path / "ai.jsonl")
+    inner = _Counting()
+    c = CachingAIClient(inner, path=path)
+    assert c.resolve("s", "u", {}) == {"n": 1}
+    assert c.resolve("s", "u", {}) == {"n": 1}          # served from memory
+    assert c.resolve("s", "other", {}) == {"n": 2}
+    assert inner.calls == 2
+
+    with open(path, "a", encoding="utf-8") as fh:
+        fh.write('{"k": "torn')                           # interrupted append
+    inner2 = _Counting()
+    c2 = CachingAIClient(inner2, path=path)              # fresh run reuses the file
+    assert c2.resolve("s", "u", {}) == {"n": 1}
+    assert inner2.calls == 0
+    c2.resolve("s", "new", {})                           # appended after the torn line
+    assert CachingAIClient(_Counting(), path=path).resolve("s", "new", {}) == {"n": 1}
+
+
+def test_answer_cache_is_shared_and_capped(tmp_path):
+    path = str(tmp_path / "ai.jsonl")
+    cache = AnswerCache(path, max_entries=4)
+    a, b = _Counting(), _Counting()
+    CachingAIClient(a, cache=cache).resolve("s", "u", {})
+    assert CachingAIClient(b, cache=cache).resolve("s", "u", {}) == {"n": 1}
+    assert b.calls == 0                                  # one store for both clients
+    for i in range(5):
+        CachingAIClient(a, cache=cache).resolve("s", f"x{i}", {})
+    with open(path, encoding="utf-8") as fh:
+        assert len(fh.readlines()) <= 4                  # compacted, not appended forever
+    fresh = _Counting()
+    assert CachingAIClient(fresh, path=path).resolve("s", "x4", {}) == {"n": 6}
+    assert fresh.calls == 0                              # newest answers survive
+
+
+def _msg(payload):
+    return type("M", (), {"content": [type("B", (), {"type": "text",
+                "text": json.dumps(payload)})()]})()
+
+
+class _FakeBatches:
+    def __init__(self):
+        self.polls = 0
+        self.submitted = []
+    def create(self, requests):
+        self.submitted = requests
+        return type("Batch", (), {"id": "b1", "processing_status": "in_progress"})()
+    def retrieve(self, batch_id):
+        self.polls += 1
+        return type("Batch", (), {"id": batch_id, "processing_status": "ended"})()
+    def results(self, batch_id):
+        # returned out of order; the second request errored
+        ok = type("R", (), {"type": "succeeded", "message": _msg({"ok": 0})})()
+        bad = type("R", (), {"type": "errored"})()
+        return [type("E", (), {"custom_id": "r1", "result": bad})(),
+                type("E", (), {"custom_id": "r0", "result": ok})()]
+
+
+def test_batch_client_submits_polls_and_orders_results():
+    fake = type("A", (), {})()
+    fake.messages = type("Msgs", (), {})()
+    fake.messages.batches = _FakeBatches()
+    c = ClaudeBatchAIClient(anthropic_client=fake, sleep=lambda s: None)
+    out = resolve_many(c, [("s", "u0", {}), ("s", "u1", {})])
+    assert out[0] == {"ok": 0}
+    assert isinstance(out[1], RuntimeError)
+    sent = fake.messages.batches.submitted
+    assert [r["custom_id"] for r in sent] == ["r0", "r1"]
+    assert sent[1]["params"]["messages"][0]["content"] == "u1"
+    assert fake.messages.batches.polls == 1
+
+
+class _StuckBatches(_FakeBatches):
+    def retrieve(self, batch_id):
+        self.polls += 1
+        return type("Batch", (), {"id": batch_id, "processing_status": "in_progress"})()
+
+
+def _batch_client(batches, state_path):
+    fake = type("A", (), {})()
+    fake.messages = type("Msgs", (), {})()
+    fake.messages.batches = batches
+    now = [0.0]
+    def sleep(s):
+        now[0] += s
+    return ClaudeBatchAIClient(anthropic_client=fake, sleep=sleep, clock=lambda: now[0],
+                               max_wait=100, poll_interval=30, state_path=state_path)
+
+
+def test_batch_client_times_out_and_a_rerun_resumes_the_batch(tmp_path):
+    state = str(tmp_path / "batches.json")
+    reqs = [("s", "u0", {}), ("s", "u1", {})]
+    stuck = _StuckBatches()
+    with pytest.raises(TimeoutError):
+        _batch_client(stuck, state).resolve_many(reqs)
+    assert stuck.polls == 4                              # bounded by max_wait
+    again = _FakeBatches()
+    out = _batch_client(again, state).resolve_many(reqs)
+    assert again.submitted == [] and out[0] == {"ok": 0}   # picked up b1, no new batch
+    assert json.loads(open(state).read()) == {}            # forgotten once read
+
+
+def test_caching_client_forwards_only_misses():
+    inner = _Counting()
+    c = CachingAIClient(inner)
+    c.resolve("s", "a", {})
+    out = resolve_many(c, [("s", "a", {}), ("s", "b", {})])
+    assert out == [{"n": 1}, {"n": 2}] and inner.calls == 2
+
+
+class _RateLimited(Exception):
+    status_code = 429
+
+
+class _BadRequest(Exception):
+    status_code = 400
+
+
+class _Flaky:
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+        self.messages = self
+    def create(self, **kw):
+        self.calls += 1
+        if self.errors:
+            err = self.errors.pop(0)
+            if isinstance(err, str):
+                return _msg_text(err)
+            raise err
+        return _msg({"ok": True})
+
+
+def _msg_text(text):
+    return type("M", (), {"content": [type("B", (), {"type": "text", "text": text})()]})()
+
+
+def test_claude_client_retries_transient_errors_and_bad_json():
+    sleeps = []
+    flaky = _Flaky([_RateLimited(), "not json", _RateLimited()])
+    c = ClaudeAIClient(anthropic_client=flaky, sleep=sleeps.append)
+    assert c.resolve("s", "u", {}) == {"ok": True}
+    assert flaky.calls == 4 and len(sleeps) == 2       # no backoff for the JSON re-ask
+
+
+def test_claude_client_does_not_retry_bad_request():
+    flaky = _Flaky([_BadRequest()])
+    c = ClaudeAIClient(anthropic_client=flaky, sleep=lambda s: None)
+    with pytest.raises(_BadRequest):
+        c.resolve("s", "u", {})
+    assert flaky.calls == 1
+
+
+def test_claude_client_turns_off_sdk_retries(monkeypatch):
+    pytest.importorskip("anthropic")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "k")
+    c = ClaudeAIClient()
+    assert c._c.max_retries == 0                       # one retry layer, not two
+
+
+def test_claude_client_scales_max_tokens_and_rejects_truncation():
+    flaky = _Flaky([])
+    c = ClaudeAIClient(anthropic_client=flaky, sleep=lambda s: None)
+    small = c._params("s", "u", {})["max_tokens"]
+    big = c._params("s", "u" * 8000, {})["max_tokens"]
+    assert small == 2000 and big > small
+    cut = type("M", (), {"stop_reason": "max_tokens", "content": []})()
+    with pytest.raises(RuntimeError):
+        c._parse(cut)
+
+
+def test_rate_limiter_spaces_calls_to_the_per_minute_cap():
+    now, sleeps = [100.0], []
+    lim = _RateLimiter(120, clock=lambda: now[0], sleep=sleeps.append)
+    for _ in range(3):
+        lim.wait()
+    assert sleeps == [0.5, 1.0]                         # slots reserved 0.5s apart
+    now[0] = 200.0                                      # idle long enough: no wait
+    lim.wait()
+    assert sleeps == [0.5, 1.0]
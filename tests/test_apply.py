@@ -151,3 +151,40 @@ def test_apply_handles_ampersand_in_target(tmp_path):
     from lxml import etree
     etree.parse(str(out))                                         # output valid
     assert "&amp; Β" in out.read_text(encoding="utf-8-sig")       # ampersand preserved/escaped
+
+
+def test_backup_survives_in_place_apply(tmp_path):
+    src = _setup(tmp_path)
+    original = src.read_bytes()
+    cases = build_cases(parse_mqxliff(str(src)))
+    dec = {"T_kouti": Decision("T_kouti", "false_positive", "x", "high")}
+    apply_decisions(str(src), dec, cases, str(src))          # overwrite the input itself
+    assert Path(str(src) + ".bak").read_bytes() == original  # backup is the untouched original
+    assert src.read_bytes() != original
+
+
+def test_malformed_output_never_replaces_target(tmp_path):
+    import pytest
+    from lxml import etree
+    src = _setup(tmp_path)
+    out = tmp_path / "out.mqxliff"
+    out.write_text("previous", encoding="utf-8")
+    members = parse_mqxliff(str(src))
+    ws = [{"segmentguid": members[0].segmentguid, "new_target_inner": "<broken"}]
+    with pytest.raises(etree.XMLSyntaxError):
+        apply_decisions(str(src), {}, build_cases(members), str(out), ws_fixes=ws)
+    assert out.read_text(encoding="utf-8") == "previous"
+    assert not Path(str(out) + ".tmp").exists()
+
+
+def test_undeclared_namespace_prefix_is_rejected(tmp_path):
+    import pytest
+    from lxml import etree
+    src = _setup(tmp_path)
+    out = tmp_path / "out.mqxliff"
+    out.write_text("previous", encoding="utf-8")
+    members = parse_mqxliff(str(src))
+    ws = [{"segmentguid": members[0].segmentguid, "new_target_inner": "a <x:b/> c"}]
+    with pytest.raises(etree.XMLSyntaxError):
+        apply_decisions(str(src), {}, build_cases(members), str(out), ws_fixes=ws)
+    assert out.read_text(encoding="utf-8") == "previous"
@@ -1,5 +1,5 @@
 from qa_engine.models import Member, Issue
-from qa_engine.resolvers.batch_resolver import resolve_segment_batch, BATCH_SCHEMA
+from qa_engine.resolvers.batch_resolver import resolve_segment_batch, pack_batches, BATCH_SCHEMA
 
 
 def _m(tid, src, tgt):
@@ -71,3 +71,12 @@ def test_batch_schema_has_no_unsupported_keywords():
             for v in n:
                 walk(v)
     walk(BATCH_SCHEMA)
+
+
+def test_pack_batches_respects_count_and_size():
+    items = [(str(i), _m(str(i), "s" * n, "t" * n), []) for i, n in
+             enumerate([10, 10, 10, 400, 10])]
+    keys = lambda bs: [[k for k, _, _ in b] for b in bs]
+    assert keys(pack_batches(items, 2)) == [["0", "1"], ["2", "3"], ["4"]]
+    # size budget splits before the long segment, which still gets its own batch
+    assert keys(pack_batches(items, 10, max_chars=100)) == [["0", "1", "2"], ["3"], ["4"]]
@@ -17,7 +17,7 @@ def test_content_key_stable_and_distinct():
 
 
 def test_save_flush_reload_roundtrip(tmp_path):
-    p = str(tmp_path / "ck.json")
+    p = str(tmp_path / "ck.jsonl")
     cp = Checkpoint(p)
     assert not cp.has("g1")
     cp.save_item(_item())
@@ -34,7 +34,48 @@ def test_save_flush_reload_roundtrip(tmp_path):
 
 
 def test_corrupt_cache_starts_fresh(tmp_path):
-    p = tmp_path / "ck.json"
+    p = tmp_path / "ck.jsonl"
     p.write_text("{ this is not json", encoding="utf-8")
     cp = Checkpoint(str(p))                   # must not raise
     assert cp.all_items() == []
+
+
+def test_maybe_flush_is_throttled_and_final_flush_persists(tmp_path):
+    p = tmp_path / "ck.jsonl"
+    cp = Checkpoint(str(p), min_interval=3600)
+    cp.save_item(_item())
+    cp.maybe_flush()                          # within the interval -> no rewrite
+    assert not p.exists()
+    cp.flush()
+    assert Checkpoint(str(p)).has("g1")
+    mtime = p.stat().st_mtime_ns
+    cp.flush()                                # nothing new -> file untouched
+    assert p.stat().st_mtime_ns == mtime
+
+
+def test_flush_appends_only_new_items_and_skips_torn_line(tmp_path):
+    from dataclasses import replace
+    p = tmp_path / "ck.jsonl"
+    cp = Checkpoint(str(p))
+    cp.save_item(_item())
+    cp.flush()
+    with open(p, "a", encoding="utf-8") as fh:
+        fh.write('{"segmentguid": "g9", "trunc')     # interrupted append
+    cp2 = Checkpoint(str(p))
+    assert not cp2.has("g9") and cp2.has("g1")
+    cp2.save_item(cp2.get_item("g1"))                # resumed unchanged -> not re-appended
+    cp2.save_item(replace(_item(), segmentguid="g2"))
+    cp2.flush()
+    lines = p.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 3 and '"g2"' in lines[-1]
+    assert sorted(i.segmentguid for i in Checkpoint(str(p)).all_items()) == ["g1", "g2"]
+
+
+def test_legacy_json_checkpoint_moves_to_jsonl(tmp_path):
+    import json
+    from dataclasses import asdict
+    old = tmp_path / "ck.json"
+    old.write_text(json.dumps({"g1": asdict(_item())}), encoding="utf-8")   # snapshot format
+    cp = Checkpoint(str(tmp_path / "ck.jsonl"))
+    assert cp.has("g1") and not old.exists()
+    assert Checkpoint(str(tmp_path / "ck.jsonl")).get_item("g1").issue_count == 2
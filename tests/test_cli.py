@@ -48,3 +48,31 @@ def test_analyze_limit_caps_cases(tmp_path):
     cases, decisions, ws_fixes = run_analyze(str(src), str(out_dir), None,
                                    "claude-opus-4-8", client=_Fake(), limit=1)
     assert len(decisions) == 1
+
+
+def test_analyze_parallel_workers_match_serial(tmp_path):
+    src = tmp_path / "in.mqxliff"
+    shutil.copy(FIXTURE, src)
+    _, serial, _ = run_analyze(str(src), str(tmp_path / "a"), None, "m", client=_Fake())
+    _, parallel, _ = run_analyze(str(src), str(tmp_path / "b"), None, "m", client=_Fake(),
+                                 workers=4)
+    assert list(parallel) == list(serial) and parallel == serial
+
+
+def test_analyze_cache_reuses_replies_across_runs(tmp_path):
+    class _Counting(_Fake):
+        calls = 0
+
+        def resolve(self, *a):
+            _Counting.calls += 1
+            return super().resolve(*a)
+    src = tmp_path / "in.mqxliff"
+    shutil.copy(FIXTURE, src)
+    cache = str(tmp_path / "cache.jsonl")
+    _, first, _ = run_analyze(str(src), str(tmp_path / "a"), None, "m", client=_Counting(),
+                              cache_path=cache)
+    n = _Counting.calls
+    assert n > 0
+    _, second, _ = run_analyze(str(src), str(tmp_path / "b"), None, "m", client=_Counting(),
+                               cache_path=cache)
+    assert _Counting.calls == n and second == first
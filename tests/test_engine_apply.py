@@ -67,3 +67,14 @@ def test_apply_fix_beats_ignore_for_same_segment():
     # and reversed order -> same result
     out2 = apply_resolved_items(content, [fix, ign]).decode("utf-8-sig")
     assert "ΝΕΟ" in out2
+
+
+def test_apply_rejects_undeclared_namespace_prefix():
+    import pytest
+    from qa_engine.models import Resolution, ResolvedItem
+    content = FIX.read_bytes()
+    it = ResolvedItem("g1:x:0", "g1", "1", "3050", "p", "s", "t", "a <x:b/>",
+                      Resolution(action="fix", new_target="a <x:b/>",
+                      confidence=1.0, needs_approval=False, strategy="deterministic"))
+    with pytest.raises(etree.XMLSyntaxError):
+        apply(content, [it])
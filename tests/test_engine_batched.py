@@ -1,4 +1,5 @@
-from qa_engine.engine import analyze, reconcile
+import threading
+from qa_engine.engine import analyze, analyze_stream, reconcile
 from qa_engine.checkpoint import Checkpoint
 
 
@@ -23,8 +24,10 @@ DOC = (
 class _BatchFake:
     def __init__(self):
         self.calls = 0
+        self._lock = threading.Lock()
     def resolve(self, system, user, schema):
-        self.calls += 1
+        with self._lock:
+            self.calls += 1
         if "segments" in schema.get("properties", {}):          # batch call
             segs = [{"segment_id": g, "code_verdicts": [{"code": "3091", "verdict": "fix"}],
                      "fixed_target": f"FIX{g}", "confidence": 100, "rationale": "r"}
@@ -48,11 +51,116 @@ def test_batching_makes_fewer_calls():
     assert len(rs.auto_applied) == 3 and len(rs.pending) == 0
 
 
+def test_concurrent_batches_same_result():
+    fake = _BatchFake()
+    rs = analyze(DOC, ai_client=fake, batch_size=2, concurrency=2)
+    reconcile(rs)
+    assert fake.calls == 2                       # still one call per batch
+    assert [it.tu_id for it in rs.auto_applied] == ["1", "2", "3"]   # document order kept
+    assert all(it.resolution.new_target.startswith("FIX") for it in rs.auto_applied)
+
+
+def test_unbatched_calls_run_concurrently_same_result():
+    fake = _BatchFake()
+    rs = analyze(DOC, ai_client=fake, batch_size=1, concurrency=3)
+    reconcile(rs)
+    assert fake.calls == 3                       # one single-segment call each
+    assert [it.tu_id for it in rs.auto_applied] == ["1", "2", "3"]
+    assert all(it.resolution.new_target == "FIX" for it in rs.auto_applied)
+
+
+def test_repeated_segments_are_asked_once():
+    def seg(i):    # three segments with identical text and codes
+        return _seg(i).replace(f"term{i}<", "term<").replace(f"x{i}<", "x<")
+    doc = DOC.decode("utf-8")
+    for i in (1, 2, 3):
+        doc = doc.replace(_seg(i), seg(i))
+    seen = []
+
+    class _Rec(_BatchFake):
+        def resolve(self, system, user, schema):
+            seen.append(user.count("=== SEGMENT"))
+            return {"segments": [{"segment_id": "g1",
+                                  "code_verdicts": [{"code": "3091", "verdict": "fix"}],
+                                  "fixed_target": "FIX", "confidence": 100, "rationale": "r"}]}
+
+    rs = analyze(doc.encode("utf-8"), ai_client=_Rec(), batch_size=3)
+    reconcile(rs)
+    assert seen == [1]                           # one segment sent, not three
+    assert [it.resolution.new_target for it in rs.auto_applied] == ["FIX"] * 3
+
+
 def test_checkpoint_resume_uses_cache_no_ai(tmp_path):
-    path = str(tmp_path / "ck.json")
+    path = str(tmp_path / "ck.jsonl")
     rs1 = analyze(DOC, ai_client=_BatchFake(), batch_size=2, checkpoint=Checkpoint(path))
     reconcile(rs1)
     # Second run with a client that explodes if called — must complete purely from cache.
     rs2 = analyze(DOC, ai_client=_Boom(), batch_size=2, checkpoint=Checkpoint(path))
     reconcile(rs2)
     assert rs2.total_issues == 3 and len(rs2.auto_applied) == 3
+
+
+def test_repeats_across_flushes_are_asked_once():
+    doc = DOC.decode("utf-8")
+    for i in (1, 2, 3):            # identical text and codes on every segment
+        doc = doc.replace(_seg(i), _seg(i).replace(f"term{i}<", "term<").replace(f"x{i}<", "x<"))
+    fake = _BatchFake()
+    rs = analyze(doc.encode("utf-8"), ai_client=fake)      # serial: one segment per flush
+    reconcile(rs)
+    assert fake.calls == 1
+    assert [it.resolution.new_target for it in rs.auto_applied] == ["FIX"] * 3
+
+
+def test_failed_batch_is_not_reused_for_later_repeats():
+    doc = DOC.decode("utf-8")     # segment 3 repeats segment 1, in the next flush
+    doc = doc.replace(_seg(3), _seg(3).replace("term3<", "term1<").replace("x3<", "x1<"))
+
+    class _FailFirst(_BatchFake):
+        def resolve(self, system, user, schema):
+            super().resolve(system, user, schema)
+            if self.calls == 1:
+                raise RuntimeError("overloaded")
+            return {"segments": [{"segment_id": "g3",
+                                  "code_verdicts": [{"code": "3091", "verdict": "fix"}],
+                                  "fixed_target": "FIX", "confidence": 100, "rationale": "r"}]}
+
+    fake = _FailFirst()
+    rs = analyze(doc.encode("utf-8"), ai_client=fake, batch_size=2)
+    reconcile(rs)
+    assert fake.calls == 2                       # the repeat is asked again
+    assert [it.tu_id for it in rs.auto_applied] == ["3"]
+    assert {it.tu_id for it in rs.pending} == {"1", "2"}
+
+
+def test_abandoned_run_keeps_checkpointed_segments(tmp_path):
+    path = str(tmp_path / "ck.jsonl")
+    gen = analyze_stream(DOC, ai_client=_BatchFake(), batch_size=2, checkpoint=Checkpoint(path))
+    next(gen), next(gen)                         # first batch done, then the run is dropped
+    gen.close()
+    assert sorted(it.segmentguid for it in Checkpoint(path).all_items()) == ["g1", "g2"]
+
+
+def test_failed_batch_is_not_checkpointed(tmp_path):
+    path = str(tmp_path / "ck.jsonl")
+
+    class _Down:
+        def resolve(self, system, user, schema):
+            raise TimeoutError("message batch still processing")
+
+    analyze(DOC, ai_client=_Down(), batch_size=2, checkpoint=Checkpoint(path))
+    fake = _BatchFake()
+    rs = analyze(DOC, ai_client=fake, batch_size=2, checkpoint=Checkpoint(path))
+    assert fake.calls == 2 and len(rs.auto_applied) == 3     # asked again on resume
+
+
+def test_flush_batches_groups_submissions_independently_of_concurrency():
+    sizes = []
+
+    class _Many(_BatchFake):
+        def resolve_many(self, requests, max_workers=1):
+            sizes.append((len(requests), max_workers))
+            return [self.resolve(*r) for r in requests]
+
+    rs = analyze(DOC, ai_client=_Many(), batch_size=1, concurrency=2, flush_batches=3)
+    reconcile(rs)
+    assert sizes == [(3, 2)]             # one submission of 3, still 2 workers
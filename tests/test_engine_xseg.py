@@ -32,3 +32,26 @@ def test_cross_segment_unifies_both_to_canonical():
     targets = {it.proposed_target_preview for it in items}
     assert targets == {"Acme Corp."}          # both segments unified
     assert all(it.resolution.action == "fix" for it in items)
+
+
+class _Counting(_Canon):
+    def __init__(self, fail=False):
+        self.calls, self.fail = 0, fail
+    def resolve(self, system, user, schema):
+        self.calls += 1
+        if self.fail:
+            raise TimeoutError("message batch still processing")
+        return super().resolve(system, user, schema)
+
+
+def test_failed_phase_a_is_retried_and_a_finished_group_is_not(tmp_path):
+    from qa_engine.checkpoint import Checkpoint
+    path = str(tmp_path / "ck.jsonl")
+    analyze(_doc(), ai_client=_Counting(fail=True), checkpoint=Checkpoint(path))
+    ok = _Counting()
+    rs = analyze(_doc(), ai_client=ok, checkpoint=Checkpoint(path))
+    assert ok.calls == 1                          # the failure was not checkpointed
+    assert {it.proposed_target_preview for it in rs.auto_applied} == {"Acme Corp."}
+    again = _Counting()
+    analyze(_doc(), ai_client=again, checkpoint=Checkpoint(path))
+    assert again.calls == 0                       # whole group resumed, not re-asked
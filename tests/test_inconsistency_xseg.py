@@ -42,3 +42,22 @@ def test_non_inconsistency_issues_ignored():
     issues = [Issue("3050", "whitespace", "x", "g1", "1")]
     out = resolve_inconsistency_groups(issues, {"g1": m}, _Canon())
     assert out == {}
+
+
+class _OneFails:
+    def resolve(self, s, u, sch):
+        if "Bad" in u:
+            raise RuntimeError("timeout")
+        return {"canonical_target": "Good.", "auto_apply": True,
+                "confidence": "high", "rationale": "unify"}
+
+
+def test_groups_resolved_concurrently_and_fail_independently():
+    members = [_m("1", "Good", "Good."), _m("2", "Good", "Good"),
+               _m("3", "Bad", "X"), _m("4", "Bad", "Y")]
+    issues = [Issue("3100", "inconsistent", "x", m.segmentguid, m.tu_id) for m in members]
+    out = resolve_inconsistency_groups(issues, {m.segmentguid: m for m in members},
+                                       _OneFails(), max_workers=2)
+    assert out["g1"].new_target == "Good." and out["g2"].new_target == "Good."
+    assert out["g3"].new_target is None and out["g3"].needs_approval
+    assert "timeout" in out["g4"].rationale
@@ -1,5 +1,5 @@
 from pathlib import Path
-from qa_engine.parser import parse_issues, parse_languages
+from qa_engine.parser import parse_issues, parse_languages, iter_issues
 
 FIX = Path(__file__).parent / "fixtures" / "sample.mqxliff"
 
@@ -23,3 +23,21 @@ def test_issue_has_segment_link():
     issues, members = parse_issues(FIX.read_bytes())
     i = issues[0]
     assert i.segmentguid in members
+
+
+def test_iter_issues_matches_full_parse():
+    content = FIX.read_bytes()
+    issues, _ = parse_issues(content)
+    assert list(iter_issues(content)) == issues
+
+
+def test_parse_issues_keeps_all_members_unless_flagged_only():
+    _, members = parse_issues(FIX.read_bytes())
+    assert len(members) == 6 and "g6" in members         # unwarned variants kept
+    _, flagged = parse_issues(FIX.read_bytes(), flagged_only=True)
+    assert len(flagged) == 5 and "g6" not in flagged     # tu 6 has no warnings
+
+
+def test_parse_languages_reads_only_the_header():
+    head = FIX.read_bytes().split(b"<trans-unit", 1)[0]     # body cut off mid-document
+    assert parse_languages(head) == ("en", "el")
@@ -66,3 +66,62 @@ def test_inner_xml_escapes_ampersand_and_lt_gt(tmp_path):
     # and re-wrapping it in a target element must be parseable
     from lxml import etree
     etree.fromstring(("<target>" + m.target_text + "</target>").encode("utf-8"))
+
+
+def test_inner_xml_slices_outer_tag_with_gt_in_attribute(tmp_path):
+    from qa_engine.tags import detokenize
+    xml = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<xliff version="1.2" xmlns="urn:oasis:names:tc:xliff:document:1.2" xmlns:mq="MQXliff">\n'
+        '<file original="c" source-language="en" target-language="el" datatype="x-memoq"><body>\n'
+        '<trans-unit id="1" mq:segmentguid="g1">\n'
+        '<source xml:space="preserve" mq:note="a&gt;b">A<mq:ch val="x"/>B</source>\n'
+        '<target xml:space="preserve">Α</target>\n'
+        '</trans-unit>\n'
+        '</body></file></xliff>\n'
+    )
+    p = tmp_path / "t.mqxliff"; p.write_text(xml, encoding="utf-8")
+    m = parse_mqxliff(str(p))[0]
+    assert detokenize(m.source_text, m.source_tags) == 'A<mq:ch val="x"/>B'
+
+
+def test_inner_xml_keeps_carriage_return_raw_in_tagged_segment(tmp_path):
+    from xml.sax.saxutils import escape
+    from qa_engine.tags import detokenize
+    xml = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<xliff version="1.2" xmlns="urn:oasis:names:tc:xliff:document:1.2" xmlns:mq="MQXliff">\n'
+        '<file original="c" source-language="en" target-language="el" datatype="x-memoq"><body>\n'
+        '<trans-unit id="1" mq:segmentguid="g1">\n'
+        '<source xml:space="preserve">a&#13;b<bpt id="1">x</bpt>c&#13;d</source>\n'
+        '<target xml:space="preserve">a&#13;b</target>\n'
+        '</trans-unit>\n'
+        '</body></file></xliff>\n'
+    )
+    p = tmp_path / "t.mqxliff"; p.write_text(xml, encoding="utf-8")
+    m = parse_mqxliff(str(p))[0]
+    src = detokenize(m.source_text, m.source_tags)
+    assert src == 'a\rb<bpt id="1">x</bpt>c\rd'
+    assert m.target_text == "a\rb"                 # same as the tagless path
+    assert "&amp;#13;" not in detokenize(escape(m.source_text), m.source_tags)
+
+
+def test_parse_dispatches_unit_children_in_one_pass(tmp_path):
+    xml = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<xliff version="1.2" xmlns="urn:oasis:names:tc:xliff:document:1.2" xmlns:mq="MQXliff">\n'
+        '<file original="c" source-language="en" target-language="el" datatype="x-memoq"><body>\n'
+        '<trans-unit id="1" mq:segmentguid="g1">\n'
+        '<source xml:space="preserve">A</source>\n'
+        '<target xml:space="preserve">Α</target>\n'
+        '<mq:insertedmatch><source>A</source><target>Ά</target></mq:insertedmatch>\n'
+        '<mq:warnings40><mq:errorwarning mq:errorwarning-code="03101" '
+        'mq:errorwarning-problemname="p1" /></mq:warnings40>\n'
+        '<mq:errorwarning mq:errorwarning-code="02016" mq:errorwarning-problemname="p2" />\n'
+        '</trans-unit>\n'
+        '</body></file></xliff>\n'
+    )
+    p = tmp_path / "t.mqxliff"; p.write_text(xml, encoding="utf-8")
+    m = parse_mqxliff(str(p))[0]
+    assert (m.source_text, m.target_text, m.tm_match) == ("A", "Α", "Ά")
+    assert [pn for pn, _ in m.warning_keys] == ["p1", "p2"]
@@ -1,4 +1,4 @@
-from qa_engine.tags import tokenize, detokenize
+from qa_engine.tags import tokenize, detokenize, markers_in
 
 PH = '<ph id="1">&lt;x id=&quot;34&quot; /&gt;</ph>'
 
@@ -48,3 +48,8 @@ def test_tokenize_bpt_ept_opaque_and_roundtrip():
     assert "All-Weather Protection" in toks               # text visible
     assert len(mapping) == 2
     assert detokenize(toks, mapping) == text              # exact round-trip
+
+
+def test_markers_stop_at_first_close_and_ignore_unclosed_open():
+    assert markers_in("⟦1:<b>⟧x⟦2:</b>⟧") == {"1", "2"}
+    assert markers_in("⟦3:" + "a" * 10000) == set()     # no close: no match, no blow-up